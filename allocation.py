@@ -0,0 +1,457 @@
+"""
+Award allocation: one supplier per item, the cheapest overall plan under constraints.
+
+Highlighting only marks the lowest unit price of each line. solve_award picks the
+supplier each item is awarded to, using line totals (UP * QTY, a missing QTY counts
+as 1) and skipping quotes marked NO (and NOT SURE unless allowed), subject to
+AwardConstraints:
+
+- max_suppliers: award to at most this many suppliers
+- min_order_value: a supplier that is awarded anything gets at least this much
+  (one value, or {supplier: value})
+- preferred_suppliers / preference_margin: a preferred supplier wins a line when it
+  is within this fraction of the cheapest quote
+
+Constraints are hard: every solver covers as many lines as it can within them, then
+minimizes the cost, and lines that cannot be awarded are left out (Award.unawarded).
+
+Solvers:
+- "greedy": vectorized. Picks the supplier set one supplier at a time (most lines
+  covered, then lowest total), improves it by single swaps, awards every line to its
+  cheapest supplier in the set, then fixes suppliers under their minimum order by
+  dropping them or moving lines to them. Seconds for 50k items x 30 suppliers.
+- "exact": mixed-integer program solved with scipy.optimize.milp when scipy is
+  installed. When it stops at its time limit without proving its plan optimal, the
+  better of its plan and the greedy one is used. Without scipy, branch-and-bound over
+  supplier sets (up to EXACT_MAX_SUPPLIERS suppliers): exact for max_suppliers alone;
+  with minimum orders each set's plan is fixed up as greedy does, so it is a heuristic
+  that is never worse than greedy.
+- "auto": exact with an AUTO_MILP_TIME_LIMIT seconds budget up to EXACT_MAX_CELLS
+  items x suppliers, greedy above.
+"""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from quote_matrix import AVAILABILITY_LEVELS
+
+SOLVERS = ("auto", "greedy", "exact")
+
+# Largest items x suppliers problem "auto" hands to the exact solver; with minimum
+# orders even these can use up the time limit
+EXACT_MAX_CELLS = 250
+
+# Branch-and-bound (used for "exact" without scipy) enumerates supplier sets
+EXACT_MAX_SUPPLIERS = 16
+
+# Swap passes of the greedy local search
+GREEDY_SWAP_PASSES = 3
+
+# Seconds scipy's MILP solver may take (both phases) before the best plan found so far is used,
+# for "exact" and for the problems "auto" hands to it
+MILP_TIME_LIMIT = 10
+AUTO_MILP_TIME_LIMIT = 2
+
+# Seconds the second MILP phase gets even when the first used up the time limit
+MILP_MIN_PHASE_SECONDS = 1
+
+_NO = AVAILABILITY_LEVELS.index('NO')
+_NOT_SURE = AVAILABILITY_LEVELS.index('NOT SURE')
+
+
+@dataclass
+class AwardConstraints:
+    max_suppliers: int = None
+    min_order_value: object = 0.0
+    preferred_suppliers: tuple = ()
+    preference_margin: float = 0.0
+    allow_not_sure: bool = False
+
+
+@dataclass
+class Award:
+    """
+    - awarded: supplier index (into matrix.suppliers) per item, -1 when no supplier can supply it
+    - line_costs: awarded line total per item (NaN when unawarded)
+    """
+    matrix: object
+    constraints: AwardConstraints
+    awarded: np.ndarray
+    line_costs: np.ndarray
+    solver: str
+    seconds: float
+
+    @property
+    def total_cost(self):
+        return float(np.nansum(self.line_costs))
+
+    @property
+    def unawarded(self):
+        return int((self.awarded < 0).sum())
+
+    def supplier_summary(self):
+        """Items and value awarded per supplier, suppliers with an award only."""
+        has_award = self.awarded >= 0
+        counts = np.bincount(self.awarded[has_award], minlength=self.matrix.num_suppliers)
+        values = np.bincount(self.awarded[has_award], weights=self.line_costs[has_award],
+                             minlength=self.matrix.num_suppliers)
+        used = np.flatnonzero(counts)
+        return pd.DataFrame({
+            'SUPPLIER': self.matrix.suppliers[used],
+            'ITEMS AWARDED': counts[used],
+            'AWARD VALUE': values[used],
+        })
+
+    def baselines(self):
+        """
+        What the same lines cost when bought from a single supplier (only the lines it
+        can supply) and when every line goes to its cheapest quote with no constraints.
+        """
+        costs = _line_costs(self.matrix, _feasible(self.matrix, self.constraints))
+        finite = np.isfinite(costs)
+        cheapest = np.where(finite.any(axis=1), np.min(costs, axis=1, initial=np.inf), np.nan)
+        single = np.where(finite, costs, 0).sum(axis=0)
+        frame = pd.DataFrame({
+            'PLAN': ['AWARD PLAN', 'CHEAPEST PER LINE (NO CONSTRAINTS)']
+                    + [f"ALL FROM {supplier}" for supplier in self.matrix.suppliers],
+            'TOTAL COST': np.concatenate([[self.total_cost, np.nansum(cheapest)], single]),
+            'ITEMS COVERED': np.concatenate([[(self.awarded >= 0).sum(), np.isfinite(cheapest).sum()],
+                                             finite.sum(axis=0)]),
+        })
+        frame['ITEMS NOT COVERED'] = self.matrix.num_items - frame['ITEMS COVERED']
+        frame['VS AWARD PLAN'] = frame['TOTAL COST'] - self.total_cost
+        return frame
+
+    def items_frame(self):
+        """One row per item: the item columns, the awarded supplier, its unit price and line total."""
+        rows = np.arange(self.matrix.num_items)
+        has_award = self.awarded >= 0
+        frame = pd.DataFrame({name: values for name, values in self.matrix.item_columns.items()
+                              if name in ('ITEM CODE', 'DESCRIPTION', 'QTY')})
+        frame['AWARDED TO'] = np.where(has_award, self.matrix.suppliers.to_numpy(dtype=object)[
+            np.where(has_award, self.awarded, 0)], None)
+        frame['UP'] = np.where(has_award, self.matrix.prices[rows, np.where(has_award, self.awarded, 0)], np.nan)
+        frame['LINE TOTAL'] = self.line_costs
+        return frame
+
+
+def _feasible(matrix, constraints):
+    """items x suppliers mask of the quotes that can be awarded."""
+    feasible = ~np.isnan(matrix.prices) & (matrix.availability != _NO)
+    if not constraints.allow_not_sure:
+        feasible &= matrix.availability != _NOT_SURE
+    return feasible
+
+
+def _line_costs(matrix, feasible):
+    qty = np.where(np.isnan(matrix.qty), 1.0, matrix.qty)
+    return np.where(feasible, matrix.prices * qty[:, None], np.inf)
+
+
+def _per_supplier(value, suppliers):
+    if isinstance(value, dict):
+        wanted = {str(name).strip().upper(): float(v) for name, v in value.items()}
+        return np.array([wanted.get(supplier, 0.0) for supplier in suppliers])
+    return np.full(len(suppliers), float(value or 0.0))
+
+
+def _selection_costs(matrix, costs, constraints):
+    """Costs the solvers minimize: preferred suppliers discounted by the margin."""
+    if not constraints.preferred_suppliers or not constraints.preference_margin:
+        return costs
+    preferred = matrix.suppliers.isin([str(name).strip().upper() for name in constraints.preferred_suppliers])
+    return np.where(preferred, costs * (1 - constraints.preference_margin), costs)
+
+
+def _assign(costs, chosen):
+    """Cheapest supplier within chosen (indices) per row, -1 where none of them quotes."""
+    chosen = np.asarray(chosen, dtype=np.intp)
+    if not len(chosen):
+        return np.full(len(costs), -1)
+    sub = costs[:, chosen]
+    best = sub.argmin(axis=1)
+    return np.where(np.isfinite(sub[np.arange(len(costs)), best]), chosen[best], -1)
+
+
+def _score(current, costs):
+    """(lines covered, total) per candidate column when added to a set whose best row costs are current."""
+    merged = np.minimum(current[:, None], costs)
+    finite = np.isfinite(merged)
+    return finite.sum(axis=0), np.where(finite, merged, 0).sum(axis=0)
+
+
+def _best_candidate(current, costs, candidates):
+    covered, total = _score(current, costs[:, candidates])
+    best = np.lexsort((total, -covered))[0]  # most lines covered, then lowest total
+    return candidates[best], covered[best], total[best]
+
+
+def _greedy_order(costs, max_suppliers):
+    """Suppliers in the order greedy adds them: each time the one covering most lines, then lowest total."""
+    num_suppliers = costs.shape[1]
+    chosen = []
+    current = np.full(len(costs), np.inf)
+    for _ in range(min(max_suppliers, num_suppliers)):
+        candidates = np.setdiff1d(np.arange(num_suppliers), chosen)
+        supplier, _, _ = _best_candidate(current, costs, candidates)
+        chosen.append(int(supplier))
+        current = np.minimum(current, costs[:, supplier])
+    return chosen
+
+
+def _greedy_set(costs, max_suppliers):
+    num_suppliers = costs.shape[1]
+    chosen = _greedy_order(costs, max_suppliers)
+
+    # single swaps: replace one chosen supplier by the best outside one while that helps
+    for _ in range(GREEDY_SWAP_PASSES):
+        improved = False
+        for position in range(len(chosen)):
+            others = chosen[:position] + chosen[position + 1:]
+            rest = costs[:, others].min(axis=1) if others else np.full(len(costs), np.inf)
+            before = _score(rest, costs[:, [chosen[position]]])
+            candidates = np.setdiff1d(np.arange(num_suppliers), chosen)
+            if not len(candidates):
+                break
+            supplier, covered, total = _best_candidate(rest, costs, candidates)
+            if (covered, -total) > (before[0][0], -before[1][0]):
+                chosen[position] = int(supplier)
+                improved = True
+        if not improved:
+            break
+    return chosen
+
+
+def _award_values(line_costs, awarded):
+    """Value awarded to each supplier."""
+    has_award = awarded >= 0
+    return np.bincount(awarded[has_award], weights=line_costs[np.flatnonzero(has_award), awarded[has_award]],
+                       minlength=line_costs.shape[1])
+
+
+def _top_up(costs, line_costs, awarded, values, supplier, minimums):
+    """
+    Moves lines to supplier from other suppliers, cheapest extra cost first, until it
+    reaches its minimum order without taking any donor below its own. Returns the new
+    awarded array, or None when the minimum cannot be reached.
+    """
+    rows = np.flatnonzero((awarded >= 0) & (awarded != supplier) & np.isfinite(costs[:, supplier]))
+    rows = rows[np.argsort(costs[rows, supplier] - costs[rows, awarded[rows]], kind="stable")]
+    donors = awarded[rows]
+    given = line_costs[rows, donors]
+    # a donor's lines are taken in order while it stays at its minimum, so the allowed ones are a prefix per donor
+    given_so_far = pd.Series(given).groupby(donors).cumsum().to_numpy()
+    allowed = values[donors] - given_so_far >= minimums[donors]
+    rows = rows[allowed]
+    reached = np.flatnonzero(np.cumsum(line_costs[rows, supplier]) >= minimums[supplier] - values[supplier])
+    if not len(reached):
+        return None
+    awarded = awarded.copy()
+    awarded[rows[:reached[0] + 1]] = supplier
+    return awarded
+
+
+def _plan_key(costs, awarded):
+    """Plans compare by lines left unawarded, then cost (None: no plan)."""
+    if awarded is None:
+        return (np.inf, np.inf)
+    has_award = awarded >= 0
+    return int((~has_award).sum()), float(costs[np.flatnonzero(has_award), awarded[has_award]].sum())
+
+
+def _enforce_min_order(costs, line_costs, chosen, minimums):
+    """
+    Fixes chosen suppliers under their minimum order, smallest award first: dropped when
+    their lines can all go to another chosen supplier, otherwise topped up with lines
+    from the others (see _top_up), otherwise dropped leaving their lines unawarded.
+    """
+    chosen = list(chosen)
+    awarded = _assign(costs, chosen)
+    while True:
+        values = _award_values(line_costs, awarded)
+        under = [j for j in chosen if 0 < values[j] < minimums[j]]
+        if not under:
+            return awarded
+        supplier = min(under, key=lambda j: values[j])
+        others = [j for j in chosen if j != supplier]
+        lines = np.flatnonzero(awarded == supplier)
+        topped_up = None
+        if not np.isfinite(costs[np.ix_(lines, others)]).any(axis=1).all():
+            topped_up = _top_up(costs, line_costs, awarded, values, supplier, minimums)
+        if topped_up is not None:
+            awarded = topped_up
+        else:
+            chosen = others
+            awarded[lines] = _assign(costs[lines], others)
+
+
+def _solve_greedy(costs, line_costs, max_suppliers, minimums):
+    coverable = np.isfinite(costs).any(axis=1)
+    num_suppliers = costs.shape[1]
+    size = num_suppliers if max_suppliers is None else min(max_suppliers, num_suppliers)
+    if not minimums.any():
+        chosen = list(range(num_suppliers)) if size == num_suppliers else _greedy_set(costs[coverable], size)
+        return _assign(costs, chosen)
+
+    # minimum orders can strand lines of dropped suppliers: fewer, larger suppliers may cover more,
+    # so the greedy sets of every size down from the limit are tried
+    order = _greedy_order(costs[coverable], size)
+    best, best_key = None, None
+    uncoverable = int((~coverable).sum())
+    for set_size in range(size, 0, -1):
+        awarded = _enforce_min_order(costs, line_costs, order[:set_size], minimums)
+        key = _plan_key(costs, awarded)
+        if best_key is None or key < best_key:
+            best, best_key = awarded, key
+        if best_key[0] == uncoverable:
+            break
+    return best
+
+
+def _solve_milp(costs, line_costs, max_suppliers, minimums, time_limit=MILP_TIME_LIMIT):
+    """
+    x[i, j] = line i awarded to supplier j (only for quotes that can be awarded), y[j] = j gets an award.
+    Solved twice: first for the most lines covered, then for the lowest cost covering that many,
+    both within time_limit seconds. Returns (awarded, whether both phases were proven
+    optimal); awarded is None when the time ran out before any plan was found.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_matrix, hstack
+
+    num_items, num_suppliers = costs.shape
+    rows, cols = np.nonzero(np.isfinite(costs))
+    num_x = len(rows)
+    x_ids = np.arange(num_x)
+
+    constraints = [
+        # each line awarded at most once
+        LinearConstraint(hstack([coo_matrix((np.ones(num_x), (rows, x_ids)), shape=(num_items, num_x)),
+                                 coo_matrix((num_items, num_suppliers))]), 0, 1),
+        # x <= y: lines only go to suppliers that get an award
+        LinearConstraint(hstack([coo_matrix((np.ones(num_x), (x_ids, x_ids))),
+                                 coo_matrix((-np.ones(num_x), (x_ids, cols)), shape=(num_x, num_suppliers))]),
+                         -np.inf, 0),
+    ]
+    if max_suppliers is not None:
+        constraints.append(LinearConstraint(np.concatenate([np.zeros(num_x), np.ones(num_suppliers)]), 0,
+                                            max_suppliers))
+    if minimums.any():
+        # awarded value - minimum * y >= 0
+        value = coo_matrix((line_costs[rows, cols], (cols, x_ids)), shape=(num_suppliers, num_x))
+        constraints.append(LinearConstraint(hstack([value, coo_matrix(-np.diag(minimums))]), 0, np.inf))
+
+    deadline = time.perf_counter() + time_limit
+
+    def solve(objective, constraints):
+        time_limit = max(deadline - time.perf_counter(), MILP_MIN_PHASE_SECONDS)
+        return milp(objective, constraints=constraints, integrality=np.ones(num_x + num_suppliers),
+                    bounds=Bounds(0, 1), options={"time_limit": time_limit})
+
+    def plan(result):
+        picked = result.x[:num_x] > 0.5
+        awarded = np.full(num_items, -1)
+        awarded[rows[picked]] = cols[picked]
+        return awarded
+
+    first = solve(np.concatenate([-np.ones(num_x), np.zeros(num_suppliers)]), constraints)
+    if first.x is None:
+        return None, False
+    constraints.append(LinearConstraint(np.concatenate([np.ones(num_x), np.zeros(num_suppliers)]),
+                                        round(-first.fun), np.inf))
+    second = solve(np.concatenate([costs[rows, cols], np.zeros(num_suppliers)]), constraints)
+    if second.x is None:
+        # the plan of the first phase still meets every constraint
+        return plan(first), False
+    return plan(second), first.status == 0 and second.status == 0
+
+
+def _solve_branch_and_bound(costs, line_costs, max_suppliers, minimums):
+    """
+    Depth-first search over supplier sets, each awarding every line to its cheapest
+    supplier in the set, with minimum orders fixed up by _enforce_min_order. Plans
+    compare by lines left uncovered, then cost; a branch is cut when even adding every
+    remaining supplier, ignoring minimum orders, cannot beat the best plan found.
+    """
+    num_items, num_suppliers = costs.shape
+    if num_suppliers > EXACT_MAX_SUPPLIERS:
+        raise ValueError(f"The exact solver without scipy handles up to {EXACT_MAX_SUPPLIERS} suppliers, "
+                         f"got {num_suppliers}; install scipy or use the greedy solver")
+    limit = num_suppliers if max_suppliers is None else max_suppliers
+    # cheapest suppliers first so good plans are found early
+    order = list(np.argsort(np.where(np.isfinite(costs), costs, 0).sum(axis=0)))
+    best = {"key": (num_items, 0.0), "awarded": np.full(num_items, -1)}
+
+    def bound(row_costs):
+        finite = np.isfinite(row_costs)
+        return int((~finite).sum()), float(row_costs[finite].sum())
+
+    def evaluate(chosen):
+        awarded = _enforce_min_order(costs, line_costs, chosen, minimums)
+        key = _plan_key(costs, awarded)
+        if key < best["key"]:
+            best.update(key=key, awarded=awarded)
+
+    def branch(position, chosen, current):
+        if len(chosen) == limit or position == len(order):
+            return
+        if bound(np.minimum(current, costs[:, order[position:]].min(axis=1))) >= best["key"]:
+            return
+        supplier = order[position]
+        evaluate(chosen + [supplier])
+        branch(position + 1, chosen + [supplier], np.minimum(current, costs[:, supplier]))
+        branch(position + 1, chosen, current)
+
+    branch(0, [], np.full(num_items, np.inf))
+    return best["awarded"]
+
+
+def scipy_available():
+    try:
+        import scipy.optimize  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def solve_award(matrix, constraints=None, solver="auto"):
+    """Award plan for a QuoteMatrix (the selected suppliers), see the module docstring."""
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver!r}, expected one of {SOLVERS}")
+    constraints = constraints or AwardConstraints()
+    start = time.perf_counter()
+
+    feasible = _feasible(matrix, constraints)
+    line_costs = _line_costs(matrix, feasible)
+    costs = _selection_costs(matrix, line_costs, constraints)
+    minimums = _per_supplier(constraints.min_order_value, matrix.suppliers)
+    max_suppliers = constraints.max_suppliers
+
+    constrained = (max_suppliers is not None and max_suppliers < matrix.num_suppliers) or minimums.any()
+    time_limit = MILP_TIME_LIMIT
+    if solver == "auto":
+        solver = "exact" if constrained and costs.size <= EXACT_MAX_CELLS else "greedy"
+        time_limit = AUTO_MILP_TIME_LIMIT
+    if solver == "exact" and constrained and scipy_available():
+        awarded, optimal = _solve_milp(costs, line_costs, max_suppliers, minimums, time_limit)
+        used = "exact (milp)"
+        if not optimal:
+            greedy = _solve_greedy(costs, line_costs, max_suppliers, minimums)
+            if _plan_key(costs, greedy) < _plan_key(costs, awarded):
+                awarded, used = greedy, "greedy (milp hit its time limit)"
+            else:
+                used = "milp (time limit, not proven optimal)"
+    elif solver == "exact" and constrained:
+        awarded = _solve_branch_and_bound(costs, line_costs, max_suppliers, minimums)
+        used = "heuristic (branch and bound)" if minimums.any() else "exact (branch and bound)"
+    else:
+        # without a supplier limit or minimum order the cheapest line per row is the optimum
+        awarded = _solve_greedy(costs, line_costs, max_suppliers, minimums)
+        used = "greedy" if constrained else "cheapest per line"
+
+    has_award = awarded >= 0
+    awarded_costs = np.full(matrix.num_items, np.nan)
+    awarded_costs[has_award] = line_costs[np.flatnonzero(has_award), awarded[has_award]]
+    return Award(matrix=matrix, constraints=constraints, awarded=awarded, line_costs=awarded_costs,
+                 solver=used, seconds=time.perf_counter() - start)
@@ -0,0 +1,126 @@
+"""
+Price anomaly detection across the suppliers of a quotation.
+
+Highlighting only marks the lowest price of each line, so a missing decimal point
+(1250 instead of 12.50) or a per-box price typed as a per-unit price is highlighted
+as the best offer, or silently skews the totals. detect_anomalies flags, per cell:
+
+- NON-NUMERIC: something other than a number typed in an UP cell
+- ZERO OR NEGATIVE: a unit price <= 0
+- HIGH OUTLIER / LOW OUTLIER: more than OUTLIER_THRESHOLD robust deviations from the
+  line's median unit price, with at least OUTLIER_MIN_QUOTES positive prices on the line
+- FAR BELOW 2ND: the lowest price of the line, with the second lowest at least
+  FAR_BELOW_RATIO times higher (the likely decimal slip that would win the line)
+
+Statistics are computed for all lines at once on the items x suppliers price array:
+each row is sorted once (blanks last), so the median, the second lowest price and,
+after a second sort, the median absolute deviation (MAD) are indexed, not looped.
+The robust deviation is (UP - median) / max(1.4826 * MAD, MIN_RELATIVE_SPREAD * median),
+the floor keeping lines where most suppliers quote the same price from flagging cents.
+"""
+import numpy as np
+import pandas as pd
+
+OUTLIER_THRESHOLD = 5.0
+
+OUTLIER_MIN_QUOTES = 3
+
+FAR_BELOW_RATIO = 5.0
+
+MIN_RELATIVE_SPREAD = 0.1
+
+# MAD of normally distributed prices times this is their standard deviation
+MAD_SCALE = 1.4826
+
+ANOMALY_KINDS = ('NON-NUMERIC', 'ZERO OR NEGATIVE', 'HIGH OUTLIER', 'LOW OUTLIER', 'FAR BELOW 2ND')
+
+ANOMALY_COLUMNS = ['LINE', 'ITEM CODE', 'DESCRIPTION', 'SUPPLIER', 'UP', 'MEDIAN UP', 'ROBUST Z', 'RATIO TO 2ND',
+                   'ISSUE']
+
+# ISSUE text of every combination of kinds, indexed by the bit mask of the kinds
+_ISSUES = np.array(["; ".join(kind for bit, kind in enumerate(ANOMALY_KINDS) if mask >> bit & 1)
+                    for mask in range(1 << len(ANOMALY_KINDS))], dtype=object)
+
+
+def _sorted_median(ordered, counts):
+    """Median of each row of a row-sorted array whose first counts[i] values are valid (NaN without any)."""
+    lower = np.take_along_axis(ordered, np.maximum((counts - 1) // 2, 0)[:, None], axis=1)[:, 0]
+    upper = np.take_along_axis(ordered, np.maximum(counts // 2, 0)[:, None], axis=1)[:, 0]
+    return np.where(counts > 0, (lower + upper) / 2, np.nan)
+
+
+def price_statistics(prices):
+    """
+    Per-line statistics of an items x suppliers unit price array over its positive prices:
+    (quotes, median, mad, best, second), NaN where a line has too few quotes.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    num_items, num_suppliers = prices.shape
+    positive = prices > 0  # NaN compares False
+    quotes = positive.sum(axis=1)
+    if not num_suppliers:
+        blank = np.full(num_items, np.nan)
+        return quotes, blank, blank, blank, blank
+
+    ordered = np.sort(np.where(positive, prices, np.nan), axis=1)  # NaN sorts last
+    median = _sorted_median(ordered, quotes)
+    deviation = np.sort(np.where(positive, np.abs(prices - median[:, None]), np.nan), axis=1)
+    mad = _sorted_median(deviation, quotes)
+    best = ordered[:, 0]
+    second = ordered[:, 1] if num_suppliers > 1 else np.full(num_items, np.nan)
+    return quotes, median, mad, best, second
+
+
+def detect_anomalies(matrix):
+    """
+    One row per flagged cell of a QuoteMatrix, in sheet order, with the columns of
+    ANOMALY_COLUMNS (DESCRIPTION only when the sheet has one). UP is the value as
+    typed for NON-NUMERIC cells. ISSUE lists every kind the cell is flagged for.
+    """
+    prices = matrix.prices
+    num_items, num_suppliers = prices.shape
+    quotes, median, mad, best, second = price_statistics(prices)
+
+    scale = np.maximum(MAD_SCALE * mad, MIN_RELATIVE_SPREAD * median)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        robust_z = (prices - median[:, None]) / scale[:, None]
+        ratio = second / best
+    positive = prices > 0
+    outlier = positive & (quotes >= OUTLIER_MIN_QUOTES)[:, None] & ~(np.abs(robust_z) <= OUTLIER_THRESHOLD)
+    is_best = positive & (prices == best[:, None])
+
+    non_numeric = np.zeros((num_items, num_suppliers), dtype=bool)
+    if matrix.raw_prices:
+        rows, cols = zip(*matrix.raw_prices)
+        non_numeric[list(rows), list(cols)] = True
+
+    kinds = (non_numeric,
+             prices <= 0,
+             outlier & (robust_z > 0),
+             outlier & (robust_z < 0),
+             is_best & (ratio >= FAR_BELOW_RATIO)[:, None])
+    mask = np.zeros((num_items, num_suppliers), dtype=np.uint8)
+    for bit, flagged in enumerate(kinds):
+        mask |= flagged.astype(np.uint8) << bit
+
+    items, suppliers = np.nonzero(mask)
+    up = prices[items, suppliers].astype(object)
+    if matrix.raw_prices:
+        for position in np.flatnonzero(non_numeric[items, suppliers]):
+            up[position] = matrix.raw_prices[(int(items[position]), int(suppliers[position]))]
+
+    data = {
+        'LINE': items + 1,
+        'ITEM CODE': matrix.item_columns.get('ITEM CODE', np.full(num_items, None))[items],
+    }
+    if 'DESCRIPTION' in matrix.item_columns:
+        data['DESCRIPTION'] = matrix.item_columns['DESCRIPTION'][items]
+    data.update({
+        'SUPPLIER': matrix.suppliers.to_numpy(dtype=object)[suppliers],
+        'UP': up,
+        'MEDIAN UP': median[items],
+        'ROBUST Z': np.where(positive[items, suppliers], robust_z[items, suppliers], np.nan),
+        'RATIO TO 2ND': np.where(is_best[items, suppliers], ratio[items], np.nan),
+        'ISSUE': _ISSUES[mask[items, suppliers]],
+    })
+    return pd.DataFrame(data)
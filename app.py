@@ -1,11 +1,20 @@
 # Automating vendor comparison
 
 import pandas as pd
-import xlsxwriter
-import io
+import time
+from pathlib import Path
 import streamlit as st
-from xlsxwriter.utility import xl_col_to_name
-from funcs import generate_supplier_template, modify_uploaded_file, login_screen, logout
+from funcs import get_supplier_template, parse_uploaded_file, write_award_workbook
+from funcs import TEMPLATE_MAX_ROWS, TEMPLATE_MAX_SUPPLIERS
+from allocation import SOLVERS, AwardConstraints, solve_award
+from currency import load_fx_rates
+from exports import EXPORT_EXTENSIONS, EXPORT_MIME_TYPES, available_formats, write_export
+from jobs import submit_merged_comparison
+from ui import login_screen
+from validation import PLACEHOLDER_SUPPLIER, HeaderCheck, validate_header
+
+# How often the page checks on a running comparison
+JOB_POLL_SECONDS = 0.5
 
 #TODO add logout functionality if no activity after X amount of time
 
@@ -21,19 +30,26 @@ else:
 
     st.button("Log out", on_click=st.logout)
 
-    options = list(range(1, 21))
-
-    num_suppliers = st.selectbox(
-        label = "1. How many suppliers would you like to compare?",
-        placeholder = "Select number of suppliers",
-        options=options,
-    )
-
-    output = io.BytesIO()
+    col1, col2 = st.columns(2)
+    with col1:
+        num_suppliers = st.number_input(
+            label = "1. How many suppliers would you like to compare?",
+            min_value=1,
+            max_value=TEMPLATE_MAX_SUPPLIERS,
+            value=1,
+        )
+    with col2:
+        num_rows = st.number_input(
+            label = "How many items (rows) does the quotation have?",
+            min_value=1,
+            max_value=TEMPLATE_MAX_ROWS,
+            value=100,
+            step=100,
+        )
 
     # Provide a template for supplier comparison
 
-    buffer = generate_supplier_template(num_suppliers=num_suppliers, num_rows=100)
+    buffer = get_supplier_template(num_suppliers=int(num_suppliers), num_rows=int(num_rows))
 
     st.markdown("<h5><strong>1. Download the template below to add the quotations from different suppliers.</strong></h4>", 
                 unsafe_allow_html=True)
@@ -63,17 +79,39 @@ else:
     st.markdown("<h5><strong>2. Upload your completed Excel file below.</strong></h4>", 
                 unsafe_allow_html=True)
 
-    uploaded_file = st.file_uploader(
+    st.caption("You can also upload one file per supplier: they are matched on ITEM CODE. Each supplier is named "
+               "as in its file header, or after the file name if the header still says Supplier 1.")
+
+    uploaded_files = st.file_uploader(
         label="Upload here", 
-        type=["xlsx"]
+        type=["xlsx"],
+        accept_multiple_files=True
     )
-
-    #TODO add check that correct file (no changed headers, etc.) is uploaded or throw an error below
-
-    if uploaded_file is not None:
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+
+    # Only rows 1-3 are read here, so a file with changed headers is rejected before it is parsed
+    header_checks = {f.name: validate_header(f.getvalue()) for f in uploaded_files}
+    detected_suppliers = {}
+    for file_name, check in header_checks.items():
+        for issue in check.errors:
+            st.error(f"❌ {file_name}: {issue}")
+        for issue in check.warnings:
+            st.warning(f"⚠️ {file_name}: {issue}")
+        for name, cell in check.suppliers.items():
+            # merged uploads name a supplier still called "Supplier 1" after its file (see ingest.py)
+            if len(uploaded_files) > 1 and PLACEHOLDER_SUPPLIER.match(name):
+                name = Path(file_name).stem.strip().upper()
+            detected_suppliers.setdefault(name, f"{file_name} {cell}")
+    headers_ok = all(check.ok for check in header_checks.values())
+
+    if len(uploaded_files) > 1 and headers_ok:
+        st.success(f"✅ {len(uploaded_files)} supplier files uploaded: {', '.join(f.name for f in uploaded_files)}")
+
+    if uploaded_file is not None and headers_ok:
         try:
-            df = pd.read_excel(uploaded_file)
-            quotation_name = df.columns[1]  
+            parsed = parse_uploaded_file(uploaded_file.getvalue())
+            df = parsed.preview
+            quotation_name = parsed.quotation_name
             # print(f"Quotation name: ", df.iloc[0,1])
             # print(f"Quotation Name: {df.columns[1]}")
 
@@ -99,6 +137,12 @@ else:
         key="name_input_area"
     )
 
+    if detected_suppliers:
+        st.caption(f"Suppliers found in the header: {', '.join(detected_suppliers)}")
+        if st.button("Use detected suppliers"):
+            st.session_state.names = list(detected_suppliers)
+            st.rerun()
+
     # User adds supplier names
     if st.button("Add Names"):
         if multi_input:
@@ -115,7 +159,6 @@ else:
             st.warning("Please enter at least one name.")
 
     #TODO add check that number of suppliers given matches number of suppliers selected in the first step
-    #TODO more flexibility for format of suppliers added (lower case, upper case)
 
     # Display added names with remove buttons
     st.markdown(f"<h5><strong>Added suppliers (ensure these are correct):</strong>",unsafe_allow_html=True)
@@ -149,19 +192,145 @@ else:
 
     #TODO next to enable functionality to work with merged supplier header because of added availability columns and highlighted functionality for yellow for unavailable products    
 
-    if uploaded_file is not None and st.session_state.names:
-        try:
-            file = pd.read_excel(uploaded_file, sheet_name='Supplier Quotation', header=[1, 2])
-            modified_df, excel_buffer = modify_uploaded_file(supplier_names=supplier_names_input, uploaded_file=file, quotation_name=quotation_name)
-
+    # Names are matched case-insensitively; unknown ones are reported before anything is parsed
+    unknown_suppliers = []
+    if uploaded_files and headers_ok and st.session_state.names:
+        _, unknown_suppliers = HeaderCheck(suppliers=detected_suppliers).match_suppliers(st.session_state.names)
+        for issue in unknown_suppliers:
+            st.error(f"❌ {issue}")
+
+    # Optional conversion to one currency, with the rates of the local FX table (see currency.py)
+    supplier_currencies, base_currency = {}, None
+    try:
+        fx_rates = load_fx_rates()
+    except FileNotFoundError:
+        fx_rates = None
+    except ValueError as e:
+        fx_rates = None
+        st.warning(f"⚠️ Could not read the exchange rates: {e}")
+    # The choice only takes effect once applied, so no comparison (or history record) runs
+    # with currencies the user has not picked yet
+    currencies_pending = False
+    if fx_rates is not None and fx_rates.rates and st.session_state.names:
+        with st.expander("💱 Currencies"):
+            if st.checkbox("Suppliers quote in different currencies"):
+                with st.form("currencies"):
+                    chosen_base = st.selectbox("Compare in", fx_rates.currencies, key="base_currency")
+                    chosen = {name: st.selectbox(f"{name} quotes in", fx_rates.currencies,
+                                                 index=fx_rates.currencies.index(chosen_base), key=f"currency_{name}")
+                              for name in st.session_state.names}
+                    if st.form_submit_button("Apply currencies"):
+                        st.session_state.applied_currencies = (chosen_base, chosen)
+                st.caption(f"Rates from {fx_rates.source}")
+                applied = st.session_state.get("applied_currencies")
+                if applied and set(applied[1]) == set(st.session_state.names):
+                    base_currency, supplier_currencies = applied
+                else:
+                    currencies_pending = True
+                    st.info("Apply the currencies to run the comparison.")
+
+    if uploaded_files and headers_ok and not unknown_suppliers and st.session_state.names and not currencies_pending:
+        # Runs in the background; every rerun resubmits and gets the same job back
+        job = submit_merged_comparison([(f.name, f.getvalue()) for f in uploaded_files], supplier_names_input,
+                                       supplier_currencies, base_currency)
+
+        # Ready as soon as the best prices are known, while the workbook is still being written
+        if job.comparison is not None:
+            st.dataframe(job.comparison.summary(), hide_index=True)
+
+        if not job.done():
+            st.progress(job.progress, text=f"Processing ({job.stage})... {job.elapsed:.0f}s")
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
+        elif job.error is not None:
+            st.error(f"❌ Error processing the file: {job.error}")
+        else:
             st.download_button(
                 label="📥 Download Quotation with Highlights",
-                data=excel_buffer,
+                data=job.output,
                 file_name="highlighted_quotation.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
-        except Exception as e:
-            st.error(f"❌ Error processing the file: {e}")
+
+        if job.comparison is not None and len(job.comparison.anomalies):
+            anomalies = job.comparison.anomalies
+            st.warning(f"⚠️ {len(anomalies)} price(s) look wrong (outliers, zero or non-numeric); "
+                       "they are listed on the 'Anomalies' sheet of the download.")
+            with st.expander("🔎 Price anomalies"):
+                st.dataframe(anomalies, hide_index=True)
+
+        if job.comparison is not None:
+            with st.expander("🏆 Award plan"):
+                matrix = job.comparison.matrix
+                col1, col2 = st.columns(2)
+                with col1:
+                    max_suppliers = st.number_input("Max. number of suppliers (0 = no limit)", min_value=0,
+                                                    max_value=matrix.num_suppliers, value=0)
+                    min_order_value = st.number_input("Min. order value per supplier", min_value=0.0, value=0.0)
+                    solver = st.selectbox("Solver", SOLVERS)
+                with col2:
+                    preferred = st.multiselect("Preferred suppliers", list(matrix.suppliers))
+                    preference_margin = st.number_input("Preferred supplier wins within (%)", min_value=0.0,
+                                                        max_value=100.0, value=0.0) / 100
+                    allow_not_sure = st.checkbox("Award items marked NOT SURE")
+
+                if st.button("Solve award plan"):
+                    constraints = AwardConstraints(max_suppliers=max_suppliers or None, min_order_value=min_order_value,
+                                                   preferred_suppliers=tuple(preferred),
+                                                   preference_margin=preference_margin, allow_not_sure=allow_not_sure)
+                    try:
+                        award = solve_award(matrix, constraints, solver)
+                        st.session_state.award = (job.key, award,
+                                                  write_award_workbook(award, job.quotation_name).getvalue())
+                    except Exception as e:
+                        st.error(f"❌ Could not solve the award plan: {e}")
+
+                if st.session_state.get("award") and st.session_state.award[0] == job.key:
+                    _, award, award_workbook = st.session_state.award
+                    st.write(f"Total cost **{award.total_cost:,.2f}**, {award.unawarded} item(s) not awarded "
+                             f"({award.solver}, {award.seconds:.2f}s)")
+                    st.dataframe(award.baselines(), hide_index=True)
+                    st.dataframe(award.supplier_summary(), hide_index=True)
+                    st.download_button(
+                        label="📥 Download Award Plan",
+                        data=award_workbook,
+                        file_name="award_plan.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+
+            with st.expander("📦 Data export (Parquet / Arrow / CSV)"):
+                export_format = st.selectbox("Format", available_formats(),
+                                             help="One row per item and supplier, for BI tools and scripts")
+                if st.button("Prepare export"):
+                    st.session_state.export = (job.key, export_format,
+                                               write_export(job.comparison, export_format, job.quotation_name))
+
+                if st.session_state.get("export") and st.session_state.export[:2] == (job.key, export_format):
+                    st.download_button(
+                        label=f"📥 Download {export_format.upper()}",
+                        data=st.session_state.export[2],
+                        file_name=f"quotation_comparison{EXPORT_EXTENSIONS[export_format]}",
+                        mime=EXPORT_MIME_TYPES[export_format]
+                    )
+
+        if job.coverage is not None and not job.coverage.empty:
+            st.warning(f"⚠️ {len(job.coverage)} item code(s) are missing from some of the supplier files.")
+            st.dataframe(job.coverage, hide_index=True)
+
+        if job.skipped:
+            st.warning(f"⚠️ {sum(job.skipped.values())} row(s) were left out because their ITEM CODE is blank "
+                       "or repeats one listed earlier in the same file.")
+            st.dataframe(pd.DataFrame({"FILE": list(job.skipped), "ROWS LEFT OUT": list(job.skipped.values())}),
+                         hide_index=True)
+
+        if job.qty_conflicts is not None and not job.qty_conflicts.empty:
+            st.warning(f"⚠️ {len(job.qty_conflicts)} item(s) have a different QTY in some of the supplier files. "
+                       "Every supplier's TOTAL uses the QTY USED below.")
+            st.dataframe(job.qty_conflicts, hide_index=True)
+
+        if job.profile:
+            with st.expander("⏱️ Processing stages"):
+                st.dataframe(pd.DataFrame(job.profile).drop(columns=["timestamp"]))
 
     # modified_df, excel_buffer = modify_uploaded_file(supplier_names=supplier_names_input, uploaded_file=file)
 
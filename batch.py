@@ -0,0 +1,164 @@
+"""
+Headless batch processing of filled-in supplier quotation workbooks.
+
+Compares the suppliers of every workbook found in the given directories
+or glob patterns on a process pool. Supplier names are read from the merged
+header row of each 'Supplier Quotation' sheet, and each highlighted output is
+written next to its input as <name>_highlighted.xlsx. The compared prices are
+also recorded in the price history (see history.py) unless --history-db is "".
+--format adds columnar exports (see exports.py) next to it, or replaces the workbook.
+
+    python batch.py quotes/
+    python batch.py "quotes/2025-*/*.xlsx" --workers 8
+    python batch.py quotes/ --award --max-suppliers 3 --min-order 5000
+    python batch.py quotes/ --format xlsx --format parquet
+    python batch.py quotes/ --base-currency EUR --currency HERMES=USD --currency SARA=GBP
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+OUTPUT_SUFFIX = "_highlighted"
+
+OUTPUT_FORMATS = ("xlsx", "parquet", "arrow", "csv")
+
+
+def find_workbooks(patterns, suffix=OUTPUT_SUFFIX):
+    """Expands directories and glob patterns to .xlsx files, skipping outputs and Excel lock files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*.xlsx"))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for match in sorted(matches):
+            path = Path(match)
+            if path.name.startswith("~$") or path.stem.endswith(suffix) or path in paths:
+                continue
+            paths.append(path)
+    return paths
+
+
+def output_path_for(path, suffix=OUTPUT_SUFFIX, fmt="xlsx"):
+    return path.with_name(f"{path.stem}{suffix}.{fmt}")
+
+
+def process_workbook(path, suffix=OUTPUT_SUFFIX, history_db=None, award_constraints=None, formats=("xlsx",),
+                     supplier_currencies=None, base_currency=None):
+    """
+    Worker: highlights one workbook, returns (path, suppliers, rows, seconds).
+    With award_constraints (allocation.AwardConstraints) the output gets an 'Award' sheet.
+    formats: any of OUTPUT_FORMATS, each written from the same comparison.
+    With base_currency, prices are converted from supplier_currencies first (see currency.py).
+    """
+    from currency import quoted_currencies
+    from exports import write_export
+    from funcs import file_digest, parse_uploaded_file, compare_suppliers, write_comparison
+    from quote_matrix import QuoteMatrix
+    from validation import validate_header
+
+    start = time.perf_counter()
+    file_bytes = Path(path).read_bytes()
+    # a file with broken headers fails here, before its rows are parsed
+    check = validate_header(file_bytes)
+    check.raise_for_errors()
+    supplier_names = list(check.suppliers)
+    parsed = parse_uploaded_file(file_bytes, cache=False)  # every file is read once
+
+    matrix = QuoteMatrix.from_quotation_frame(parsed.quotation).select(supplier_names)
+    comparison = compare_suppliers(matrix, supplier_names, supplier_currencies, base_currency)
+    if "xlsx" in formats:
+        award = None
+        if award_constraints is not None:
+            from allocation import solve_award
+            award = solve_award(comparison.matrix, award_constraints)
+        output = write_comparison(comparison, parsed.quotation_name, spill_to_disk=True, award=award)
+        with output, open(output_path_for(Path(path), suffix), "wb") as out_file:
+            shutil.copyfileobj(output, out_file)
+    for fmt in formats:
+        if fmt != "xlsx":
+            output_path_for(Path(path), suffix, fmt).write_bytes(
+                write_export(comparison, fmt, parsed.quotation_name))
+
+    if history_db:
+        from history import record_quotation
+        record_quotation(matrix, parsed.quotation_name, file_hash=file_digest(file_bytes), db_path=history_db,
+                         supplier_currencies=quoted_currencies(comparison.matrix, base_currency))
+
+    return path, supplier_names, len(parsed.quotation), time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="directories or glob patterns of quotation workbooks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--suffix", default=OUTPUT_SUFFIX, help="appended to the input name for the output file")
+    parser.add_argument("--history-db", default=os.environ.get("VENDOR_HISTORY_DB", "price_history.sqlite"),
+                        help='SQLite price history to record into ("" to skip recording)')
+    parser.add_argument("--award", action="store_true", help="add an 'Award' sheet with the cheapest award plan")
+    parser.add_argument("--max-suppliers", type=int, help="award plan: at most this many suppliers")
+    parser.add_argument("--min-order", type=float, default=0.0, help="award plan: minimum order value per supplier")
+    parser.add_argument("--allow-not-sure", action="store_true", help="award plan: award items marked NOT SURE")
+    parser.add_argument("--format", dest="formats", action="append", choices=OUTPUT_FORMATS,
+                        help="output format, repeat for several (default: xlsx); parquet and arrow need pyarrow")
+    parser.add_argument("--base-currency", help="convert every quote to this currency (rates from VENDOR_FX_RATES)")
+    parser.add_argument("--currency", dest="currencies", action="append", default=[], metavar="SUPPLIER=CODE",
+                        help="currency a supplier quotes in, repeat per supplier (default: the base currency)")
+    args = parser.parse_args(argv)
+
+    award_constraints = None
+    if args.award:
+        from allocation import AwardConstraints
+        award_constraints = AwardConstraints(max_suppliers=args.max_suppliers, min_order_value=args.min_order,
+                                             allow_not_sure=args.allow_not_sure)
+
+    formats = tuple(dict.fromkeys(args.formats or ["xlsx"]))
+    supplier_currencies = {}
+    for entry in args.currencies:
+        supplier, _, currency = entry.partition("=")
+        if not supplier.strip() or not currency.strip():
+            parser.error(f"--currency expects SUPPLIER=CODE, got {entry!r}")
+        supplier_currencies[supplier.strip().upper()] = currency.strip().upper()
+    if supplier_currencies and not args.base_currency:
+        parser.error("--currency needs --base-currency")
+    if args.base_currency:
+        from currency import check_currencies
+        try:
+            check_currencies(supplier_currencies, args.base_currency)
+        except ValueError as e:
+            parser.error(str(e))
+
+    paths = find_workbooks(args.paths, args.suffix)
+    if not paths:
+        print("No .xlsx files found.")
+        return 1
+
+    print(f"Processing {len(paths)} workbook(s) with {args.workers} worker(s)")
+    failures = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(process_workbook, path, args.suffix, args.history_db, award_constraints,
+                                   formats, supplier_currencies, args.base_currency): path
+                   for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _, supplier_names, num_rows, seconds = future.result()
+                print(f"OK    {seconds:7.2f}s  {path}  ({num_rows} rows, {', '.join(supplier_names)})")
+            except Exception as e:
+                failures.append((path, e))
+                print(f"FAIL           {path}  {type(e).__name__}: {e}")
+
+    print(f"\n{len(paths) - len(failures)} succeeded, {len(failures)} failed in {time.perf_counter() - start:.2f}s")
+    for path, error in failures:
+        print(f"  {path}: {type(error).__name__}: {error}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
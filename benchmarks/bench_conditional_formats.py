@@ -0,0 +1,70 @@
+"""
+Write time and output size of the highlighted quotation, per-cell conditional
+formats (the old behaviour of modify_uploaded_file) vs range-based rules.
+
+    python benchmarks/bench_conditional_formats.py
+    python benchmarks/bench_conditional_formats.py --rows 1000 10000 --suppliers 5 20
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import pandas as pd
+from xlsxwriter.utility import xl_col_to_name
+
+from synthetic import make_quotation_frame, supplier_names
+from funcs import modify_uploaded_file
+
+
+def per_cell_highlight(final_df, num_data_rows):
+    """Writes final_df with one conditional format per highlighted cell, as before."""
+    output_buffer = io.BytesIO()
+    with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:
+        workbook = writer.book
+        final_df.to_excel(writer, index=False, sheet_name="Quotation", startrow=1)
+        worksheet = writer.sheets['Quotation']
+        green_format = workbook.add_format({'bg_color': '#C6EFCE', 'font_color': '#006100'})
+        red_format = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})
+        orange_format = workbook.add_format({'bg_color': '#FFEB9C', 'font_color': '#9C6500'})
+
+        up_letters = [xl_col_to_name(i) for i, col in enumerate(final_df.columns) if col.endswith("_UP")]
+        avail_letters = [xl_col_to_name(i) for i, col in enumerate(final_df.columns) if col.endswith("_AVAILABLE")]
+        for row_num in range(3, num_data_rows + 3):
+            formula = "MIN(" + ",".join(f"{letter}{row_num}" for letter in up_letters) + ")"
+            for letter in up_letters:
+                cell = f"{letter}{row_num}"
+                worksheet.conditional_format(cell, {'type': 'formula', 'criteria': f"{cell}={formula}", 'format': green_format})
+            for letter in avail_letters:
+                cell = f"{letter}{row_num}"
+                worksheet.conditional_format(cell, {'type': 'cell', 'criteria': '==', 'value': '"NO"', 'format': red_format})
+                worksheet.conditional_format(cell, {'type': 'cell', 'criteria': '==', 'value': '"NOT SURE"', 'format': orange_format})
+    return output_buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--suppliers", type=int, nargs="+", default=[5, 10, 20])
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'suppliers':>9} | {'per-cell s':>10} {'per-cell MB':>11} | {'range s':>8} {'range MB':>8}")
+    for num_rows in args.rows:
+        for num_suppliers in args.suppliers:
+            frame = make_quotation_frame(num_rows, num_suppliers)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                final_df, range_buffer = modify_uploaded_file(frame, supplier_names(num_suppliers), "BENCH")
+            range_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cell_buffer = per_cell_highlight(final_df, num_rows)
+            cell_seconds = time.perf_counter() - start
+
+            print(f"{num_rows:>7} {num_suppliers:>9} | {cell_seconds:>10.2f} {len(cell_buffer.getvalue()) / 1e6:>11.2f}"
+                  f" | {range_seconds:>8.2f} {len(range_buffer.getvalue()) / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cold-start import time of the app's modules, each in a fresh interpreter.
+
+Every module is imported with `python -X importtime -c "import <module>"`; the
+time reported is its cumulative import time (best of --repeat runs), with the
+heaviest top-level packages it pulled in. The processing modules must not load
+Streamlit (only the app and ui.py do), so batch jobs and service workers start
+without it; the run exits with status 1 when one does.
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --save benchmarks/imports.json
+    python benchmarks/bench_imports.py --compare benchmarks/imports.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a worker process or CLI run imports
+PROCESSING_MODULES = ("funcs", "jobs", "batch", "server", "validation", "exports", "currency", "anomalies",
+                      "allocation", "history", "reader")
+
+# Packages that only the Streamlit app may import
+UI_PACKAGES = ("streamlit",)
+
+# Timings below this are noise and never count as regressions
+MIN_SECONDS = 0.02
+
+
+def _repo_modules():
+    return {name[:-3] for name in os.listdir(REPO_DIR) if name.endswith(".py")}
+
+
+def import_times(module):
+    """
+    (cumulative import seconds of module, {package: cumulative seconds} of the top-level
+    packages it pulled in), importing module in a new interpreter. Interpreter startup
+    (site, encodings) is not counted.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True)
+    entries = []  # (depth, name, cumulative seconds), children before their parent
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(cumulative) / 1e6))
+
+    position = max(index for index, (depth, name, _) in enumerate(entries) if depth == 0 and name == module)
+    packages = {}
+    for depth, name, seconds in reversed(entries[:position]):
+        if depth == 0:
+            break  # the imports before this belong to interpreter startup
+        if "." not in name:
+            packages[name] = max(packages.get(name, 0), seconds)
+    return entries[position][2], packages
+
+
+def measure(module, repeat, top):
+    total, packages = min((import_times(module) for _ in range(repeat)), key=lambda run: run[0])
+    repo_modules = _repo_modules()
+    heaviest = sorted(((name, seconds) for name, seconds in packages.items() if name not in repo_modules),
+                      key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "import_s": round(total, 4),
+        "heaviest": {name: round(seconds, 4) for name, seconds in heaviest},
+        "ui_packages": sorted(name for name in packages if name in UI_PACKAGES),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions of results against baseline."""
+    previous = {case["module"]: case for case in baseline["results"]}
+    regressions = []
+    for case in results:
+        before = previous.get(case["module"])
+        if before is None or case["import_s"] < MIN_SECONDS:
+            continue
+        old, new = before["import_s"], case["import_s"]
+        if new > old * (1 + threshold):
+            regressions.append(f"{case['module']}: import_s {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(PROCESSING_MODULES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=3, help="heaviest packages listed per module")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the results against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'module':>12} {'import s':>9}  heaviest")
+    for module in args.modules:
+        case = measure(module, args.repeat, args.top)
+        results.append(case)
+        heaviest = ", ".join(f"{name} {seconds:.3f}" for name, seconds in case["heaviest"].items())
+        print(f"{module:>12} {case['import_s']:>9.3f}  {heaviest}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "options": {key: value for key, value in vars(args).items() if key not in ("save", "compare")},
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    status = 0
+    leaks = [case for case in results if case["ui_packages"] and case["module"] in PROCESSING_MODULES]
+    if leaks:
+        print("\nUI packages imported by processing modules:")
+        for case in leaks:
+            print(f"  {case['module']}: {', '.join(case['ui_packages'])}")
+        status = 1
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.compare}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
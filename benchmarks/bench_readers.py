@@ -0,0 +1,48 @@
+"""
+Parse time of a filled-in quotation workbook per reader engine (reader.py),
+against the previous pd.read_excel path (ExcelFile parsed twice with openpyxl).
+
+    python benchmarks/bench_readers.py
+    python benchmarks/bench_readers.py --rows 1000 10000 --suppliers 15
+"""
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from synthetic import make_quotation_workbook
+from reader import READER_ENGINES, calamine_available, read_quotation
+
+
+def read_with_pandas(file_bytes):
+    with pd.ExcelFile(io.BytesIO(file_bytes)) as excel_file:
+        excel_file.parse(0)
+        excel_file.parse('Supplier Quotation', header=[1, 2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--suppliers", type=int, default=15)
+    args = parser.parse_args()
+
+    engines = [engine for engine in READER_ENGINES if engine != "calamine" or calamine_available()]
+    readers = {"pd.read_excel": read_with_pandas}
+    readers.update({engine: (lambda data, engine=engine: read_quotation(data, engine=engine)) for engine in engines})
+    if not calamine_available():
+        print("python-calamine is not installed, skipping the calamine engine")
+
+    print(f"{'rows':>7} {'MB':>6} | " + " ".join(f"{name:>18}" for name in readers))
+    for num_rows in args.rows:
+        file_bytes = make_quotation_workbook(num_rows, args.suppliers)
+        timings = []
+        for read in readers.values():
+            start = time.perf_counter()
+            read(file_bytes)
+            timings.append(time.perf_counter() - start)
+        print(f"{num_rows:>7} {len(file_bytes) / 1e6:>6.1f} | " + " ".join(f"{seconds:>17.2f}s" for seconds in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Load test for the HTTP service (server.py): throughput and latency percentiles.
+
+Sends --requests POST /compare requests from --concurrency client threads and reports
+requests per second, latency percentiles of the successful ones, and how many were
+turned away with 503 (back-pressure) or failed. --unique synthetic workbooks are
+generated up front (see synthetic.py) and sent round-robin: with --unique 1 every
+request after the first is a cache hit, with --unique equal to --requests none is.
+
+    python server.py --port 8080 --workers 4 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8080 --requests 200 --concurrency 16 --unique 200
+
+Without --url a server is started in-process on a free port with --workers/--queue.
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from synthetic import make_quotation_workbook, supplier_names
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def send(url, body):
+    """(status, seconds, X-Cache) of one request."""
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": "application/octet-stream"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            return response.status, time.perf_counter() - start, response.headers.get("X-Cache")
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, time.perf_counter() - start, None
+    except OSError:
+        return None, time.perf_counter() - start, None
+
+
+def run(base_url, args):
+    bodies = [make_quotation_workbook(args.rows, args.suppliers, seed=seed) for seed in range(args.unique)]
+    url = f"{base_url}/compare?format={args.format}&suppliers={','.join(supplier_names(args.suppliers))}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda i: send(url, bodies[i % len(bodies)]), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    ok = sorted(seconds for status, seconds, _ in results if status == 200)
+    statuses = {}
+    for status, _, cache in results:
+        label = f"{status} {cache}" if cache else str(status)
+        statuses[label] = statuses.get(label, 0) + 1
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "unique": args.unique,
+        "rows": args.rows,
+        "suppliers": args.suppliers,
+        "format": args.format,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_p50_s": round(percentile(ok, 0.50), 4),
+        "latency_p90_s": round(percentile(ok, 0.90), 4),
+        "latency_p99_s": round(percentile(ok, 0.99), 4),
+        "latency_mean_s": round(statistics.fmean(ok), 4) if ok else None,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running service (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--unique", type=int, default=10, help="distinct workbooks sent round-robin")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--suppliers", type=int, default=5)
+    parser.add_argument("--format", default="xlsx", help="xlsx, parquet, arrow or csv")
+    parser.add_argument("--workers", type=int, default=None, help="in-process server: worker processes")
+    parser.add_argument("--queue", type=int, default=None, help="in-process server: queue size")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        from server import SERVICE_QUEUE_SIZE, ProcessingService, make_server
+
+        service = ProcessingService(args.workers, SERVICE_QUEUE_SIZE if args.queue is None else args.queue)
+        server = make_server("127.0.0.1", 0, service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        results = run(base_url.rstrip("/"), args)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            service.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Benchmark suite for the comparison pipeline with regression checks.
+
+For every (rows, suppliers) in the grid it times, on synthetic filled-in quotations
+(see synthetic.py):
+- template: generate_supplier_template for that size
+- parse: parse_uploaded_file on the workbook bytes (parse cache cleared first)
+- modify: modify_uploaded_file for all suppliers, workbook only
+and records the output workbook size. Each timing is the best of --repeat runs.
+
+    python benchmarks/run_benchmarks.py --save benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --threshold 0.25
+
+With --compare the run exits with status 1 when any timing is more than
+--threshold (fraction) slower than the baseline, or any output grew by more than
+that. Baselines are only comparable on the same machine.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import PRICE_DISTRIBUTIONS, make_quotation_workbook, supplier_names
+import funcs
+
+METRICS = ("template_s", "parse_s", "modify_s", "output_bytes")
+
+# Timings below this are noise and never count as regressions
+MIN_SECONDS = 0.05
+
+
+def best_of(repeat, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_case(num_rows, num_suppliers, args):
+    file_bytes = make_quotation_workbook(num_rows, num_suppliers, seed=args.seed,
+                                         price_distribution=args.price_distribution,
+                                         nan_fraction=args.nan_fraction,
+                                         availability_mix=args.availability_mix)
+
+    template_s, _ = best_of(args.repeat, lambda: funcs.generate_supplier_template(num_suppliers, num_rows))
+
+    def parse():
+        funcs._parse_cache.clear()
+        return funcs.parse_uploaded_file(file_bytes, engine=args.engine)
+    parse_s, parsed = best_of(args.repeat, parse)
+
+    names = supplier_names(num_suppliers)
+    modify_s, (_, output) = best_of(args.repeat, lambda: funcs.modify_uploaded_file(
+        parsed.quotation, names, parsed.quotation_name, return_frame=False))
+
+    return {
+        "rows": num_rows,
+        "suppliers": num_suppliers,
+        "engine": parsed.engine,
+        "template_s": round(template_s, 4),
+        "parse_s": round(parse_s, 4),
+        "modify_s": round(modify_s, 4),
+        "output_bytes": len(output.getvalue()),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions of results against baseline."""
+    previous = {(case["rows"], case["suppliers"]): case for case in baseline["results"]}
+    regressions = []
+    for case in results:
+        before = previous.get((case["rows"], case["suppliers"]))
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), case[metric]
+            if old is None or (metric.endswith("_s") and new < MIN_SECONDS):
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{case['rows']} rows x {case['suppliers']} suppliers: "
+                                   f"{metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--suppliers", type=int, nargs="+", default=[5, 20])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default="auto", help="reader engine for parse (see reader.py)")
+    parser.add_argument("--price-distribution", choices=PRICE_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--nan-fraction", type=float, default=0.05)
+    parser.add_argument("--availability-mix", type=float, nargs=3, default=[0.8, 0.1, 0.1],
+                        metavar=("YES", "NO", "NOT_SURE"))
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the results against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>7} {'suppliers':>9} {'template s':>10} {'parse s':>8} {'modify s':>9} {'output MB':>9}")
+    for num_rows in args.rows:
+        for num_suppliers in args.suppliers:
+            case = run_case(num_rows, num_suppliers, args)
+            results.append(case)
+            print(f"{num_rows:>7} {num_suppliers:>9} {case['template_s']:>10.3f} {case['parse_s']:>8.3f}"
+                  f" {case['modify_s']:>9.3f} {case['output_bytes'] / 1e6:>9.2f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "pandas": pd.__version__, "numpy": np.__version__},
+        "options": {key: value for key, value in vars(args).items() if key not in ("save", "compare")},
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Synthetic supplier quotations for benchmarks.
+Frames are shaped exactly like parse_uploaded_file(...).quotation, i.e. the
+'Supplier Quotation' sheet read with the two-level (Supplier, UP/AVAILABLE) header.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+AVAILABILITY_OPTIONS = ['YES', 'NO', 'NOT SURE']
+
+PRICE_DISTRIBUTIONS = ("uniform", "lognormal", "clustered")
+
+
+def supplier_names(num_suppliers):
+    return [f"SUPPLIER{i + 1}" for i in range(num_suppliers)]
+
+
+def _prices(rng, distribution, num_rows, num_suppliers):
+    """items x suppliers unit prices rounded to cents."""
+    if distribution == "uniform":
+        prices = rng.uniform(1, 500, (num_rows, num_suppliers))
+    elif distribution == "lognormal":
+        prices = rng.lognormal(mean=3.5, sigma=1.0, size=(num_rows, num_suppliers))
+    elif distribution == "clustered":
+        # suppliers quote within ~10% of a per-item market price: close races, some ties
+        market = rng.lognormal(mean=3.5, sigma=1.0, size=(num_rows, 1))
+        prices = market * rng.normal(1.0, 0.1, (num_rows, num_suppliers)).clip(0.5)
+    else:
+        raise ValueError(f"Unknown price distribution {distribution!r}, expected one of {PRICE_DISTRIBUTIONS}")
+    return np.round(np.maximum(prices, 0.01), 2)
+
+
+def make_quotation_frame(num_rows, num_suppliers, seed=0, price_distribution="uniform", nan_fraction=0.0,
+                         availability_mix=(0.8, 0.1, 0.1)):
+    """
+    Args:
+    price_distribution: one of PRICE_DISTRIBUTIONS
+    nan_fraction: share of supplier lines left blank (no UP, no AVAILABLE)
+    availability_mix: relative weights of YES / NO / NOT SURE
+    """
+    rng = np.random.default_rng(seed)
+    columns = [
+        ('ITEM CODE', 'Unnamed: 0_level_1'),
+        ('DESCRIPTION', 'Unnamed: 1_level_1'),
+        ('QTY', 'Unnamed: 2_level_1'),
+    ]
+    data = {
+        columns[0]: [f"IT{i:07d}" for i in range(num_rows)],
+        columns[1]: [f"Item {i}" for i in range(num_rows)],
+        columns[2]: rng.integers(1, 100, num_rows),
+    }
+    prices = _prices(rng, price_distribution, num_rows, num_suppliers)
+    blank = rng.random((num_rows, num_suppliers)) < nan_fraction
+    weights = np.asarray(availability_mix, dtype=float) / np.sum(availability_mix)
+    for j, name in enumerate(supplier_names(num_suppliers)):
+        up, available = (name, 'UP'), (name, 'AVAILABLE')
+        columns.extend([up, available])
+        data[up] = np.where(blank[:, j], np.nan, prices[:, j])
+        data[available] = np.where(blank[:, j], None, rng.choice(AVAILABILITY_OPTIONS, num_rows, p=weights))
+
+    frame = pd.DataFrame(data, columns=pd.MultiIndex.from_tuples(columns))
+    return frame
+
+
+def make_quotation_workbook(num_rows, num_suppliers, seed=0, **options):
+    """
+    A filled-in quotation workbook (bytes) in the generate_supplier_template layout:
+    quotation name, merged supplier headers, UP/AVAILABLE pairs and the AVAILABLE
+    dropdown validations, with make_quotation_frame's values as data (options are
+    passed on to it).
+    """
+    import io
+    import xlsxwriter
+    from xlsxwriter.utility import xl_col_to_name
+
+    frame = make_quotation_frame(num_rows, num_suppliers, seed, **options)
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet("Supplier Quotation")
+    bold_center = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'border': 1})
+
+    worksheet.write(0, 0, 'QUOTATION NAME:', bold_center)
+    worksheet.write(0, 1, f"SYNTHETIC-{num_rows}x{num_suppliers}")
+    worksheet.merge_range(0, 3, 0, 2 + 2 * num_suppliers, 'Suppliers', bold_center)
+    for col, header in enumerate(['ITEM CODE', 'DESCRIPTION', 'QTY']):
+        worksheet.write(1, col, header, bold_center)
+    for i, name in enumerate(supplier_names(num_suppliers)):
+        worksheet.merge_range(1, 3 + 2 * i, 1, 4 + 2 * i, name, bold_center)
+    for i in range(num_suppliers):
+        worksheet.write(2, 3 + 2 * i, "UP", bold_center)
+        worksheet.write(2, 4 + 2 * i, "AVAILABLE", bold_center)
+
+    col_values = [frame.iloc[:, col].tolist() for col in range(frame.shape[1])]
+    for item in range(num_rows):
+        for col, values in enumerate(col_values):
+            value = values[item]
+            if value is not None and value == value:  # blanks and NaN stay empty
+                worksheet.write(3 + item, col, value)
+
+    for i in range(num_suppliers):
+        letter = xl_col_to_name(4 + 2 * i)
+        worksheet.data_validation(f"{letter}4:{letter}{3 + num_rows}", {
+            'validate': 'list',
+            'source': AVAILABILITY_OPTIONS,
+        })
+
+    workbook.close()
+    return output.getvalue()
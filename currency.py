@@ -0,0 +1,183 @@
+"""
+Conversion of supplier quotes in different currencies to one base currency.
+
+Exchange rates come from a local CSV file (VENDOR_FX_RATES, default fx_rates.csv)
+with one rate per currency against any reference currency, the reference itself at 1:
+
+    CURRENCY,RATE
+    EUR,1
+    USD,0.92
+    GBP,1.17
+
+RATE is the value of one unit of CURRENCY in the reference currency, so converting
+from USD to GBP multiplies by 0.92 / 1.17. The file is read once and re-read only
+when it changes on disk.
+
+Conversion happens before totals and best prices are computed: every supplier column
+of the price matrix is multiplied by its rate (one broadcast multiply), and the prices
+as quoted are kept on the matrix (QuoteMatrix.currency) so the output shows both.
+
+    matrix = convert_currency(matrix, {"HERMES": "USD", "SARA": "GBP"}, "EUR")
+"""
+import csv
+import functools
+import os
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+# Local exchange rate table; see the module docstring for the format
+FX_RATES_FILE = os.environ.get("VENDOR_FX_RATES", "fx_rates.csv")
+
+FX_CACHE_MAX_ENTRIES = 4
+
+
+@dataclass(frozen=True)
+class FxRates:
+    """{CURRENCY: value of one unit in the file's reference currency}, and the file it came from."""
+    rates: dict
+    source: str = None
+
+    @property
+    def currencies(self):
+        return sorted(self.rates)
+
+    def factor(self, currency, base_currency):
+        """Multiplier converting amounts in currency to base_currency."""
+        currency, base_currency = _code(currency), _code(base_currency)
+        unknown = [code for code in (currency, base_currency) if code not in self.rates]
+        if unknown:
+            raise ValueError(f"No exchange rate for {', '.join(unknown)} in "
+                             f"{os.path.basename(self.source) if self.source else 'the FX table'} "
+                             f"(known: {', '.join(self.currencies)})")
+        return self.rates[currency] / self.rates[base_currency]
+
+
+@dataclass(frozen=True)
+class CurrencyConversion:
+    """
+    How a QuoteMatrix was converted, one entry per supplier column:
+    - currencies: currency each supplier quoted in
+    - factors: multiplier from that currency to base_currency (1.0 for the base currency)
+    - original_prices: items x suppliers unit prices as quoted, before conversion
+    """
+    base_currency: str
+    currencies: np.ndarray
+    factors: np.ndarray
+    original_prices: np.ndarray
+
+    @property
+    def converted(self):
+        """Per supplier: whether the quote was in another currency than the base."""
+        return self.currencies != self.base_currency
+
+    def select(self, positions):
+        return replace(self, currencies=self.currencies[positions], factors=self.factors[positions],
+                       original_prices=self.original_prices[:, positions])
+
+
+def _code(currency):
+    return str(currency).strip().upper()
+
+
+@functools.lru_cache(maxsize=FX_CACHE_MAX_ENTRIES)
+def _read_fx_rates(path, modified_ns, size):
+    rates, name = {}, os.path.basename(path)  # errors name the file only, they can reach HTTP clients
+    with open(path, newline="", encoding="utf-8-sig") as rate_file:
+        reader = csv.DictReader(rate_file)
+        fields = {_code(name): name for name in reader.fieldnames or ()}
+        if not {"CURRENCY", "RATE"} <= set(fields):
+            raise ValueError(f"{name}: expected CURRENCY and RATE columns, found {reader.fieldnames}")
+        for line, row in enumerate(reader, start=2):
+            currency, rate = _code(row[fields["CURRENCY"]] or ""), row[fields["RATE"]]
+            if not currency:
+                continue
+            try:
+                rate = float(rate)
+            except (TypeError, ValueError):
+                rate = None
+            if rate is None or not rate > 0:
+                raise ValueError(f"{name}, line {line}: the rate of {currency} must be a positive number")
+            rates[currency] = rate
+    return FxRates(rates=rates, source=path)
+
+
+def load_fx_rates(path=FX_RATES_FILE):
+    """
+    FxRates of the CSV file at path, memoized on the file's path, modification time and
+    size. Raises FileNotFoundError when there is no file, ValueError when it is malformed.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _read_fx_rates(path, stat.st_mtime_ns, stat.st_size)
+
+
+def check_currencies(supplier_currencies, base_currency, fx_rates=None):
+    """
+    FxRates (the local FX table when fx_rates is None) with a rate for base_currency
+    and every currency of supplier_currencies. Raises ValueError when the table is
+    missing, malformed or lacks one of them, so a request can be rejected up front.
+    """
+    if fx_rates is None:
+        try:
+            fx_rates = load_fx_rates()
+        except FileNotFoundError:
+            raise ValueError(f"No exchange rate table {os.path.basename(FX_RATES_FILE)} "
+                             "(see VENDOR_FX_RATES)") from None
+    for currency in (supplier_currencies or {}).values():
+        if currency:
+            fx_rates.factor(currency, base_currency)
+    fx_rates.factor(base_currency, base_currency)
+    return fx_rates
+
+
+def convert_currency(matrix, supplier_currencies, base_currency, fx_rates=None):
+    """
+    QuoteMatrix with every supplier's unit prices in base_currency. supplier_currencies
+    maps supplier names (case-insensitive) to the currency they quoted in; suppliers
+    not listed quoted in base_currency. Totals are recomputed from the converted prices.
+    Raises ValueError for a missing FX table or currency (see check_currencies).
+    """
+    base_currency = _code(base_currency)
+    currencies = {_code(name): _code(currency) for name, currency in (supplier_currencies or {}).items() if currency}
+    per_supplier = np.array([currencies.get(name, base_currency) for name in matrix.suppliers], dtype=object)
+    if (per_supplier == base_currency).all():
+        return matrix
+
+    fx_rates = check_currencies({}, base_currency, fx_rates)
+    factors = {currency: fx_rates.factor(currency, base_currency) for currency in set(per_supplier.tolist())}
+    column_factors = np.array([factors[currency] for currency in per_supplier], dtype=np.float64)
+    return replace(
+        matrix,
+        prices=matrix.prices * column_factors,  # broadcasts over the supplier columns
+        currency=CurrencyConversion(base_currency=base_currency, currencies=per_supplier, factors=column_factors,
+                                    original_prices=matrix.prices),
+        _totals=None,
+        _supplier_totals=None,
+    )
+
+
+def quoted_currencies(matrix, base_currency=None):
+    """
+    {supplier: currency it quoted in} of a compared QuoteMatrix, None when no base
+    currency was chosen (currencies unknown). Suppliers not converted quoted in the base.
+    """
+    if matrix.currency is not None:
+        return dict(zip(matrix.suppliers, matrix.currency.currencies.tolist()))
+    if not base_currency:
+        return None
+    return dict.fromkeys(matrix.suppliers, _code(base_currency))
+
+
+def conversion_summary(matrix):
+    """Per supplier of a converted QuoteMatrix: currency, rate and the total quote as quoted and converted."""
+    conversion = matrix.currency
+    base = conversion.base_currency
+    return pd.DataFrame({
+        'SUPPLIER': matrix.suppliers,
+        'CURRENCY': conversion.currencies,
+        f'RATE TO {base}': conversion.factors,
+        'TOTAL QUOTE (QUOTED)': np.nansum(conversion.original_prices * matrix.qty[:, None], axis=0),
+        f'TOTAL QUOTE ({base})': matrix.supplier_totals(),
+    })
@@ -0,0 +1,110 @@
+"""
+Columnar exports of a comparison for BI tools and data pipelines.
+
+The highlighted workbook is meant for people; these formats are meant for code.
+Each is written straight from a Comparison (see funcs.compare_suppliers), without
+going through the Excel writer, as one long table with a row per (item, supplier):
+
+- QUOTATION, LINE (1-based row of the quotation), then the item columns
+- SUPPLIER, UP, TOTAL (float64, NaN where the supplier did not quote), AVAILABLE
+- IS_WINNER (the supplier holds the lowest unit price of the line), BEST UP
+- CURRENCY and QUOTED UP (the unit price as quoted) when prices were converted
+  (see currency.py); UP, TOTAL and BEST UP are then in the base currency
+
+SUPPLIER, AVAILABLE and QUOTATION are categoricals, stored as dictionaries by Parquet
+and Arrow. Parquet and Arrow IPC need pyarrow; CSV is always available.
+
+    comparison = compare_suppliers(matrix, supplier_names)
+    Path("quote.parquet").write_bytes(write_export(comparison, "parquet", quotation_name))
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from quote_matrix import AVAILABILITY_LEVELS
+
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+
+EXPORT_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+EXPORT_MIME_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "csv": "text/csv",
+}
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt == "csv" or pyarrow_available()]
+
+
+def _typed_column(values):
+    """Item column as numbers when every value is one, otherwise as nullable strings."""
+    series = pd.Series(values, dtype=object).infer_objects()
+    if series.dtype == object:
+        return series.astype("string")
+    return series
+
+
+def comparison_table(comparison, quotation_name=None):
+    """The long (item, supplier) table of a Comparison, in item order then supplier order."""
+    matrix = comparison.matrix
+    num_items, num_suppliers = matrix.num_items, matrix.num_suppliers
+    rows = np.repeat(np.arange(num_items), num_suppliers)
+    suppliers = np.tile(np.arange(num_suppliers), num_items)
+
+    data = {
+        'QUOTATION': pd.Categorical.from_codes(np.zeros(len(rows), dtype=np.int8),
+                                               categories=[str(quotation_name or "")]),
+        'LINE': rows + 1,
+    }
+    for name, values in matrix.item_columns.items():
+        if name == 'QTY':
+            data[name] = matrix.qty[rows]
+        else:
+            data[name] = _typed_column(values).take(rows).reset_index(drop=True)
+    data.update({
+        'SUPPLIER': pd.Categorical.from_codes(suppliers, categories=[str(name) for name in matrix.suppliers]),
+        # row-major ravel of an items x suppliers array is exactly the (item, supplier) order above
+        'UP': matrix.prices.ravel(),
+        'TOTAL': comparison.totals.ravel(),
+        'AVAILABLE': pd.Categorical.from_codes(matrix.availability.ravel(), categories=list(AVAILABILITY_LEVELS)),
+        'IS_WINNER': comparison.winners.ravel(),
+        'BEST UP': comparison.best_df['BEST UP'].to_numpy(dtype=np.float64)[rows],
+    })
+    if matrix.currency is not None:
+        currencies, codes = np.unique(matrix.currency.currencies.astype(str), return_inverse=True)
+        data['CURRENCY'] = pd.Categorical.from_codes(codes[suppliers], categories=currencies)
+        data['QUOTED UP'] = matrix.currency.original_prices.ravel()
+    return pd.DataFrame(data)
+
+
+def write_export(comparison, fmt, quotation_name=None):
+    """comparison_table serialized as fmt (one of EXPORT_FORMATS); returns the file bytes."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt != "csv" and not pyarrow_available():
+        raise ValueError(f"The {fmt} export needs pyarrow (pip install pyarrow); csv is always available")
+
+    frame = comparison_table(comparison, quotation_name)
+    buffer = io.BytesIO()
+    if fmt == "csv":
+        frame.to_csv(buffer, index=False)
+    elif fmt == "parquet":
+        frame.to_parquet(buffer, index=False)
+    else:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
@@ -1,235 +1,728 @@
+import numpy as np
 import pandas as pd
-import xlsxwriter
 import io
-import streamlit as st
-from xlsxwriter.utility import xl_col_to_name
-
-def login_screen():
-    st.header("This app is private.")
-    st.subheader("Please log in.")
-    st.button("Log in with Microsoft", on_click=st.login)
-
-def logout():
-    for key in st.session_state.keys():
-        del st.session_state[key]
-    st.rerun()    
+import os
+import math
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from reader import read_quotation
+from quote_matrix import QuoteMatrix
+from allocation import solve_award
+from anomalies import detect_anomalies
+from currency import conversion_summary, convert_currency
+import profiling
+
+# Max number of parsed uploads kept in memory (shared by all sessions)
+PARSE_CACHE_MAX_ENTRIES = 8
+
+# Rows converted to Python values at a time when streaming the output workbook
+STREAM_CHUNK_ROWS = 10_000
+
+# Rendered templates kept in memory, keyed by (num_suppliers, num_rows)
+TEMPLATE_CACHE_MAX_ENTRIES = 32
+
+# Optional directory where rendered templates are persisted so new worker processes start warm
+TEMPLATE_CACHE_DIR = os.environ.get("VENDOR_TEMPLATE_CACHE_DIR")
+
+# Bump when generate_supplier_template's output changes, so persisted templates are not reused
+TEMPLATE_VERSION = 2
+
+# Excel's sheet size limits
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLUMNS = 16_384
+
+# Items per comparison sheet: the sheet limit minus the name and header rows above the
+# data and the blank and TOTAL_QUOTE rows below it. Longer comparisons are split.
+SHEET_MAX_ITEMS = EXCEL_MAX_ROWS - 4
+
+# Largest template: three item columns plus an (UP, AVAILABLE) pair per supplier, three header rows
+TEMPLATE_MAX_SUPPLIERS = (EXCEL_MAX_COLUMNS - 3) // 2
+TEMPLATE_MAX_ROWS = EXCEL_MAX_ROWS - 3
 
 def generate_supplier_template(num_suppliers: int = 1, num_rows: int = 100):
-    output = io.BytesIO()
-
-    # Build empty DataFrame with required structure
+    """
+    Empty 'Supplier Quotation' workbook for num_suppliers suppliers and num_rows item rows:
+    row 1 quotation name, row 2 base and merged supplier headers, row 3 UP/AVAILABLE.
+    Column widths come from the layout, and one dropdown validation covers the
+    AVAILABLE column of every supplier, so the file size doesn't grow with num_rows.
+    """
     headers_base = ['ITEM CODE', 'DESCRIPTION', 'QTY']
-    supplier_headers = []
-    for i in range(num_suppliers):
-        supplier_headers.extend([f"Supplier {i + 1}_UP", f"Supplier {i + 1}_AVAILABLE"])
+    base_widths = [15, 25, 10]
+    num_columns = len(headers_base) + 2 * num_suppliers
+    if not 1 <= num_suppliers <= TEMPLATE_MAX_SUPPLIERS:
+        raise ValueError(f"num_suppliers must be between 1 and {TEMPLATE_MAX_SUPPLIERS}")
+    if not 1 <= num_rows <= TEMPLATE_MAX_ROWS:
+        raise ValueError(f"num_rows must be between 1 and {TEMPLATE_MAX_ROWS}")
 
-    all_columns = headers_base + supplier_headers
-    final_df = pd.DataFrame(columns=all_columns)
-    final_df = final_df.reindex(range(num_rows))  # Add empty rows
+    import xlsxwriter  # deferred: parsing and columnar exports don't need it
+    from xlsxwriter.utility import xl_col_to_name
 
-    # Start Excel writer
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        final_df.to_excel(writer, sheet_name="Supplier Quotation", startrow=3, index=False, header=False)
-
-        workbook  = writer.book
-        worksheet = writer.sheets["Supplier Quotation"]
+    with profiling.stage("template", suppliers=num_suppliers, rows=num_rows, validations=1):
+        output = io.BytesIO()
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        worksheet = workbook.add_worksheet("Supplier Quotation")
 
         bold_center = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'border': 1})
         bold_left   = workbook.add_format({'bold': True, 'align': 'left', 'valign': 'vcenter', 'border': 1})
 
-        # Row 1: QUOTATION NAME
+        # Column widths: base columns, then every supplier column (set before any row is written)
+        for col, width in enumerate(base_widths):
+            worksheet.set_column(col, col, width)
+        worksheet.set_column(len(headers_base), num_columns - 1, 18)
+
+        # Row 1: QUOTATION NAME and merged "Suppliers"
         worksheet.write('A1', 'QUOTATION NAME:', bold_left)
+        worksheet.merge_range(0, 3, 0, num_columns - 1, 'Suppliers', bold_center)
 
-        # Row 2: base headers
+        # Row 2: base headers and merged supplier headers
         for col, header in enumerate(headers_base):
             worksheet.write(1, col, header, bold_center)
-
-        # Row 2: merged supplier headers
         for i in range(num_suppliers):
             col_start = 3 + i * 2
-            col_end = col_start + 1
-            worksheet.merge_range(1, col_start, 1, col_end, f"Supplier {i + 1}", bold_center)
+            worksheet.merge_range(1, col_start, 1, col_start + 1, f"Supplier {i + 1}", bold_center)
 
         # Row 3: UP / AVAILABLE
         for i in range(num_suppliers):
             worksheet.write(2, 3 + i * 2, "UP", bold_center)
             worksheet.write(2, 4 + i * 2, "AVAILABLE", bold_center)
 
-        # Row 1: merged "Suppliers"
-        worksheet.merge_range(0, 3, 0, 3 + (2 * num_suppliers) - 1, 'Suppliers', bold_center)
-
-        # Column widths
-        worksheet.set_column("A:A", 15)
-        worksheet.set_column("B:B", 25)
-        worksheet.set_column("C:C", 10)
-        worksheet.set_column("D:Z", 18)
-
-        # Data validation: dropdown for all AVAILABLE columns
+        # Data validation: one dropdown for all AVAILABLE columns
         validation_options = ['YES', 'NO', 'NOT SURE']
-        for i in range(num_suppliers):
-            available_col_index = 4 + (i * 2)
-            col_letter = xl_col_to_name(available_col_index)
-            # print(i, col_letter)
-            cell_range = f"{col_letter}4:{col_letter}{3 + num_rows}"  # 1-based row numbers in Excel
-
-            worksheet.data_validation(cell_range, {
-                'validate': 'list',
-                'source': validation_options,
-                'input_message': 'Choose: YES, NO, or NOT SURE',
-                'error_title': 'Invalid Input',
-                'error_message': 'Only YES, NO, or NOT SURE are allowed',
-                # 'show_error_message': True
-            })
+        cell_ranges = [f"{xl_col_to_name(4 + i * 2)}4:{xl_col_to_name(4 + i * 2)}{3 + num_rows}"  # 1-based rows
+                       for i in range(num_suppliers)]
+        worksheet.data_validation(cell_ranges[0], {
+            'validate': 'list',
+            'source': validation_options,
+            'input_message': 'Choose: YES, NO, or NOT SURE',
+            'error_title': 'Invalid Input',
+            'error_message': 'Only YES, NO, or NOT SURE are allowed',
+            'multi_range': " ".join(cell_ranges),
+            # 'show_error_message': True
+        })
+
+        workbook.close()
 
     output.seek(0)
     return output
 
-def modify_uploaded_file(uploaded_file, supplier_names, quotation_name):
+class LRUCache:
+    """
+    Small thread-safe LRU mapping with a fixed number of entries.
+    Streamlit serves every session from the same process, so anything cached at
+    module level must be bounded or memory grows with the number of users.
     """
-    Args:
-    uploaded_file: DataFrame containing the uploaded Excel file.
-    supplier_names: List of supplier names to be processed (#TODO: make this input flexy as needed)
 
-    Modifies the uploaded excel file
-    - finds unit price columns
-    - adds total price columns for each supplier
-    - add summary row
-    - Highlights lowest unit prices per row and lowest total in summary
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
 
+    def clear(self):
+        with self._lock:
+            self._data.clear()
 
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+@dataclass(frozen=True)
+class ParsedQuotation:
     """
+    Result of parsing an uploaded quotation workbook once.
+    - preview: first sheet read with a single header row (what the app shows)
+    - quotation: 'Supplier Quotation' sheet with the two-level (Supplier, UP/AVAILABLE) header
+    - quotation_name: value of cell B1
+    - engine: reader engine that parsed the workbook
+
+    The frames are shared between reruns and sessions, so treat them as read-only
+    (modify_uploaded_file works on a QuoteMatrix built from the frame, not the frame itself).
+    """
+    preview: pd.DataFrame
+    quotation: pd.DataFrame
+    quotation_name: object
+    engine: str
 
-    # 1. Make unit price columns and total price columns
-    input_suppliers_lower = set(s.lower() for s in supplier_names)
-    input_suppliers_upper = set(s.upper() for s in supplier_names)
 
-    # quotation_name = uploaded_file.iloc[0,0]
-    # print(f"Quotation Name: {quotation_name}")
+_parse_cache = LRUCache(PARSE_CACHE_MAX_ENTRIES)
 
-    new_columns = []
-    for col in uploaded_file.columns:
 
-        if isinstance(col, tuple) and col[0].lower() in input_suppliers_lower:
-            new_columns.append('_'.join(col).strip())  # e.g., HERMES_UP
-        else:
-            new_columns.append(col[0] if isinstance(col, tuple) else col)  # e.g., ITEM CODE, QTY
+def file_digest(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def parse_uploaded_file(file_bytes: bytes, engine: str = "auto", cache: bool = True) -> ParsedQuotation:
+    """
+    Parses an uploaded workbook, caching the result by a hash of its bytes.
+    The workbook is read once (see reader.py for the engines) and both frames are
+    built from the same cell values, so a rerun with the same upload costs a hash.
+    cache=False bypasses the cache, for workers that read every file once and would
+    only grow their memory with it (batch.py, server.py).
+    """
+    key = file_digest(file_bytes) if cache else None
+    parsed = _parse_cache.get(key) if cache else None
+    if parsed is not None:
+        return parsed
+
+    with profiling.stage("parse", bytes=len(file_bytes)) as counts:
+        preview, quotation, quotation_name, used_engine = read_quotation(file_bytes, engine=engine)
+        counts.update(engine=used_engine, rows=len(quotation), columns=quotation.shape[1])
+    parsed = ParsedQuotation(preview=preview, quotation=quotation, quotation_name=quotation_name, engine=used_engine)
+    if cache:
+        _parse_cache.put(key, parsed)
+    return parsed
+
+
+_template_cache = LRUCache(TEMPLATE_CACHE_MAX_ENTRIES)
+
+
+def _template_path(cache_dir, num_suppliers, num_rows):
+    return os.path.join(cache_dir, f"supplier_template_v{TEMPLATE_VERSION}_{num_suppliers}x{num_rows}.xlsx")
+
+
+def get_supplier_template(num_suppliers: int = 1, num_rows: int = 100, cache_dir=TEMPLATE_CACHE_DIR) -> bytes:
+    """
+    Same workbook as generate_supplier_template, rendered once per (num_suppliers, num_rows).
+    Looks in memory first, then in cache_dir (if set), and only then generates the template,
+    saving it to both. Returns bytes, which are safe to share between sessions.
+    """
+    key = (num_suppliers, num_rows)
+    template = _template_cache.get(key)
+    if template is not None:
+        return template
+
+    path = _template_path(cache_dir, num_suppliers, num_rows) if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            template = f.read()
+    else:
+        template = generate_supplier_template(num_suppliers=num_suppliers, num_rows=num_rows).getvalue()
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write then rename so concurrent workers never read a half-written file
+            with tempfile.NamedTemporaryFile("wb", dir=cache_dir, delete=False, suffix=".tmp") as f:
+                f.write(template)
+            os.replace(f.name, path)
+
+    _template_cache.put(key, template)
+    return template
+
+
+def warm_template_cache(supplier_counts=range(1, 21), num_rows: int = 100, cache_dir=TEMPLATE_CACHE_DIR):
+    """Renders the templates for every supplier count the app offers, e.g. at startup."""
+    for num_suppliers in supplier_counts:
+        get_supplier_template(num_suppliers=num_suppliers, num_rows=num_rows, cache_dir=cache_dir)
+
+
+def compute_best_prices(prices, supplier_names):
+    """
+    Args:
+    prices: items x suppliers array of unit prices (NaN where a supplier did not quote)
+    supplier_names: supplier name for each column of prices
+
+    Finds the lowest unit price of every row in one vectorized pass.
+    Returns (best_df, winners):
+    - best_df: one row per item with BEST UP, BEST SUPPLIER (comma separated on ties),
+      TIES (number of suppliers sharing the lowest price) and SAVING VS 2ND
+      (second lowest minus lowest unit price, 0 on ties, NaN with fewer than two quotes)
+    - winners: boolean items x suppliers mask of the cells holding the row minimum
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    names = np.asarray(supplier_names, dtype=object)
+    num_items, num_suppliers = prices.shape
+
+    filled = np.where(np.isnan(prices), np.inf, prices)
+    if num_suppliers >= 2:
+        # kth=1 puts the two smallest values of each row in positions 0 and 1
+        two_smallest = np.partition(filled, 1, axis=1)
+        best, second = two_smallest[:, 0], two_smallest[:, 1]
+    else:
+        best = filled[:, 0] if num_suppliers else np.full(num_items, np.inf)
+        second = np.full(num_items, np.inf)
+
+    has_quote = np.isfinite(best)
+    winners = (filled == best[:, None]) & has_quote[:, None]
+    ties = winners.sum(axis=1)
+
+    best_supplier = np.full(num_items, "", dtype=object)
+    if num_suppliers:
+        best_supplier[has_quote] = names[winners.argmax(axis=1)[has_quote]]
+    for row in np.flatnonzero(ties > 1):
+        best_supplier[row] = ", ".join(names[winners[row]])
+
+    with np.errstate(invalid='ignore'):  # inf - inf on rows without quotes, masked below
+        saving = np.where(has_quote & np.isfinite(second), second - best, np.nan)
+
+    best_df = pd.DataFrame({
+        'BEST UP': np.where(has_quote, best, np.nan),
+        'BEST SUPPLIER': best_supplier,
+        'TIES': ties,
+        'SAVING VS 2ND': saving,
+    })
+    return best_df, winners
+
+
+def _conditional_format_columns(worksheet, col_letters, first_row, last_row, options):
+    """
+    Adds a single conditional format covering first_row:last_row (1-based) of every
+    column in col_letters. Formulas must be written relative to the top-left cell
+    of the first column.
+    """
+    ranges = [f"{letter}{first_row}:{letter}{last_row}" for letter in col_letters]
+    worksheet.conditional_format(ranges[0], dict(options, multi_range=" ".join(ranges)))
 
-    uploaded_file.columns = new_columns
-    # print(f"columns in uploaded file {uploaded_file.columns}")
 
-    for supplier in input_suppliers_upper:
-        up_col = f"{supplier}_UP"
+def _write_cell(worksheet, row, col, value, cell_format=None):
+    """Writes value with the matching xlsxwriter method; blanks (None/NaN) are skipped."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return
+    if isinstance(value, bool):
+        worksheet.write_boolean(row, col, value, cell_format)
+    elif isinstance(value, (int, float)):
+        worksheet.write_number(row, col, value, cell_format)
+    elif isinstance(value, str):
+        worksheet.write_string(row, col, value, cell_format)
+    else:
+        worksheet.write_string(row, col, str(value), cell_format)
 
-        up_index = uploaded_file.columns.get_loc(up_col)
 
-        if up_col in uploaded_file.columns:
-            total_values = uploaded_file[up_col] * uploaded_file['QTY']
-            uploaded_file.insert(loc=up_index + 1, column=f"{supplier}_TOTAL", value=total_values)
+def _comparison_layout(matrix, best_columns):
+    """
+    Column layout of the comparison sheet as (header, kind, key) tuples: item columns,
+    then UP/TOTAL/AVAILABLE per supplier, then the best price columns. Suppliers whose
+    prices were converted (see currency.py) get their UP as quoted, e.g. HERMES_UP_USD,
+    before the converted UP.
+    """
+    layout = [(str(name), 'item', name) for name in matrix.item_columns]
+    for j, supplier in enumerate(matrix.suppliers):
+        if matrix.currency is not None and matrix.currency.converted[j]:
+            layout.append((f"{supplier}_UP_{matrix.currency.currencies[j]}", 'quoted_up', j))
+        layout.append((f"{supplier}_UP", 'up', j))
+        layout.append((f"{supplier}_TOTAL", 'total', j))
+        if matrix.has_availability[j]:
+            layout.append((f"{supplier}_AVAILABLE", 'available', j))
+    layout.extend((name, 'best', name) for name in best_columns)
+    return layout
+
+
+def _chunk_values(matrix, totals, best_df, layout, start, stop):
+    """Python values for rows start:stop of every layout column (one list per column)."""
+    prices = matrix.prices[start:stop].tolist()
+    quoted = prices if matrix.currency is None else matrix.currency.original_prices[start:stop].tolist()
+    availability = matrix.availability_labels(slice(start, stop)).tolist()
+    for (i, j), value in matrix.raw_prices.items():
+        if start <= i < stop:
+            prices[i - start][j] = quoted[i - start][j] = value
+    for (i, j), value in matrix.raw_availability.items():
+        if start <= i < stop:
+            availability[i - start][j] = value
+    chunk_totals = totals[start:stop].tolist()
+
+    col_values = []
+    for _, kind, key in layout:
+        if kind == 'item':
+            col_values.append(matrix.item_columns[key][start:stop].tolist())
+        elif kind == 'up':
+            col_values.append([row[key] for row in prices])
+        elif kind == 'quoted_up':
+            col_values.append([row[key] for row in quoted])
+        elif kind == 'total':
+            col_values.append([row[key] for row in chunk_totals])
+        elif kind == 'available':
+            col_values.append([row[key] for row in availability])
         else:
-            print(f"Warning: Column {up_col} not found in the template.")
+            col_values.append(best_df[key].iloc[start:stop].tolist())
+    return col_values
+
+
+def _write_frame_rows(worksheet, row, frame, header_format):
+    """Writes frame with a header row starting at row; returns the row after it."""
+    for col, header in enumerate(frame.columns):
+        worksheet.write_string(row, col, str(header), header_format)
+    for start in range(0, len(frame), STREAM_CHUNK_ROWS):
+        chunk = frame.iloc[start:start + STREAM_CHUNK_ROWS].to_numpy(dtype=object)
+        for offset, values in enumerate(chunk):
+            for col, value in enumerate(values):
+                _write_cell(worksheet, row + 1 + start + offset, col, value)
+    return row + 1 + len(frame)
+
+
+def _write_award_sheet(workbook, award, quotation_name, bold_format, header_format):
+    """
+    'Award' sheet of an allocation.Award: plan totals, the plan against single-supplier
+    baselines, the award per supplier and the supplier awarded each item.
+    """
+    worksheet = workbook.add_worksheet("Award")
+    worksheet.write(0, 0, 'AWARD PLAN', bold_format)
+    worksheet.write(0, 1, award.solver)
+    worksheet.write(0, 3, 'QUOTATION NAME:', bold_format)
+    _write_cell(worksheet, 0, 4, quotation_name)
+    worksheet.write(1, 0, 'TOTAL COST', bold_format)
+    worksheet.write_number(1, 1, award.total_cost)
+    worksheet.write(2, 0, 'ITEMS NOT AWARDED', bold_format)
+    worksheet.write_number(2, 1, award.unawarded)
+
+    row = _write_frame_rows(worksheet, 4, award.baselines(), header_format) + 1
+    row = _write_frame_rows(worksheet, row, award.supplier_summary(), header_format) + 1
+    _write_frame_rows(worksheet, row, award.items_frame(), header_format)
+    worksheet.set_column(0, 0, 36)
+    worksheet.set_column(1, 5, 16)
+
+
+def _write_anomalies_sheet(workbook, anomalies, quotation_name, bold_format, header_format):
+    """'Anomalies' sheet: one row per flagged price (see anomalies.detect_anomalies)."""
+    worksheet = workbook.add_worksheet("Anomalies")
+    worksheet.write(0, 0, 'PRICE ANOMALIES', bold_format)
+    worksheet.write_number(0, 1, len(anomalies))
+    worksheet.write(0, 3, 'QUOTATION NAME:', bold_format)
+    _write_cell(worksheet, 0, 4, quotation_name)
+    shown = anomalies.iloc[:EXCEL_MAX_ROWS - 3]
+    _write_frame_rows(worksheet, 2, shown, header_format)
+    worksheet.set_column(0, len(shown.columns) - 2, 14)
+    worksheet.set_column(len(shown.columns) - 1, len(shown.columns) - 1, 36)
+
+
+def _write_currency_sheet(workbook, matrix, quotation_name, bold_format, header_format):
+    """'Currency' sheet of a converted comparison: each supplier's currency, rate and total quote in both."""
+    worksheet = workbook.add_worksheet("Currency")
+    worksheet.write(0, 0, 'BASE CURRENCY', bold_format)
+    worksheet.write(0, 1, matrix.currency.base_currency)
+    worksheet.write(0, 3, 'QUOTATION NAME:', bold_format)
+    _write_cell(worksheet, 0, 4, quotation_name)
+    _write_frame_rows(worksheet, 2, conversion_summary(matrix), header_format)
+    worksheet.set_column(0, 4, 22)
+
+
+def write_award_workbook(award, quotation_name):
+    """Workbook (BytesIO) with only the 'Award' sheet, see _write_award_sheet."""
+    import xlsxwriter
+
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    bold_format = workbook.add_format({'bold': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    _write_award_sheet(workbook, award, quotation_name, bold_format, header_format)
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+def _sheet_ranges(num_items, rows_per_sheet):
+    """(start, stop) item ranges of the comparison sheets, at least one (possibly empty)."""
+    return [(start, min(start + rows_per_sheet, num_items))
+            for start in range(0, max(num_items, 1), rows_per_sheet)]
+
+
+def _write_comparison_sheet(worksheet, formats, matrix, quotation_name, totals, best_df, winners, layout,
+                            start, stop):
+    """
+    Writes items start:stop as one comparison sheet: quotation name, column headers, the
+    data rows, a blank row and the TOTAL_QUOTE row of those items.
+    Returns (sheet supplier totals, static formats written, conditional format rules added).
+    """
+    from xlsxwriter.utility import xl_col_to_name
+
+    bold_format, header_format, green_format, red_format, orange_format = formats
+    first_data_row = 2  # 0-based: row 0 quotation name, row 1 column headers
+    num_rows = stop - start
+
+    worksheet.write(0, 0, 'QUOTATION NAME:', bold_format)
+    _write_cell(worksheet, 0, 1, quotation_name)
+    for col, (header, _, _) in enumerate(layout):
+        worksheet.write_string(1, col, header, header_format)
+
+    # Lowest UP per row: winners are known already, so write them with a static format
+    # instead of leaving a MIN() formula for Excel to evaluate
+    up_positions = {key: col for col, (_, kind, key) in enumerate(layout) if kind == 'up'}
+    winner_cols = {}
+    for item, supplier in zip(*(idx.tolist() for idx in np.nonzero(winners[start:stop]))):
+        winner_cols.setdefault(start + item, set()).add(up_positions[supplier])
+
+    # Only STREAM_CHUNK_ROWS rows are converted to Python objects at a time
+    for chunk_start in range(start, stop, STREAM_CHUNK_ROWS):
+        chunk_stop = min(chunk_start + STREAM_CHUNK_ROWS, stop)
+        col_values = _chunk_values(matrix, totals, best_df, layout, chunk_start, chunk_stop)
+        for item in range(chunk_start, chunk_stop):
+            green_cols = winner_cols.get(item, ())
+            for col, values in enumerate(col_values):
+                _write_cell(worksheet, first_data_row + item - start, col, values[item - chunk_start],
+                            green_format if col in green_cols else None)
+
+    supplier_totals = np.nansum(totals[start:stop], axis=0)
+    summary_row_index = first_data_row + num_rows + 1
+    worksheet.write_string(summary_row_index, 0, 'TOTAL_QUOTE')
+    lowest_total = np.nanmin(supplier_totals) if len(supplier_totals) else None
+    for col, (_, kind, key) in enumerate(layout):
+        if kind == 'total':
+            value = float(supplier_totals[key])
+            _write_cell(worksheet, summary_row_index, col, value, green_format if value == lowest_total else None)
+
+    # Highlighting the availability columns, one conditional format per status
+    # covering every data row of every AVAILABLE column
+    avail_letters = [xl_col_to_name(col) for col, (_, kind, _) in enumerate(layout) if kind == 'available']
+    rules = 0
+    if avail_letters and num_rows:
+        first_row, last_row = first_data_row + 1, first_data_row + num_rows  # 1-based
+        _conditional_format_columns(worksheet, avail_letters, first_row, last_row, {
+            'type': 'cell',
+            'criteria': '==',
+            'value': '"NO"',
+            'format': red_format
+        })
+        _conditional_format_columns(worksheet, avail_letters, first_row, last_row, {
+            'type': 'cell',
+            'criteria': '==',
+            'value': '"NOT SURE"',
+            'format': orange_format
+        })
+        rules = 2
+    return supplier_totals, sum(map(len, winner_cols.values())), rules
+
+
+def _write_summary_sheet(worksheet, formats, matrix, quotation_name, sheet_names, sheet_ranges, sheet_totals,
+                         supplier_totals):
+    """'Summary' sheet of a split comparison: items and supplier totals per sheet, then the overall TOTAL_QUOTE."""
+    bold_format, header_format, green_format = formats[:3]
+    worksheet.write(0, 0, 'QUOTATION NAME:', bold_format)
+    _write_cell(worksheet, 0, 1, quotation_name)
+    headers = ['SHEET', 'ITEMS'] + [f"{supplier}_TOTAL" for supplier in matrix.suppliers]
+    for col, header in enumerate(headers):
+        worksheet.write_string(1, col, header, header_format)
+    for row, (name, (start, stop), totals) in enumerate(zip(sheet_names, sheet_ranges, sheet_totals), start=2):
+        worksheet.write_string(row, 0, name)
+        worksheet.write_number(row, 1, stop - start)
+        for col, value in enumerate(totals.tolist(), start=2):
+            worksheet.write_number(row, col, value)
+
+    total_row = 2 + len(sheet_names) + 1
+    worksheet.write_string(total_row, 0, 'TOTAL_QUOTE')
+    worksheet.write_number(total_row, 1, matrix.num_items)
+    lowest_total = np.nanmin(supplier_totals) if len(supplier_totals) else None
+    for col, value in enumerate(supplier_totals.tolist(), start=2):
+        worksheet.write_number(total_row, col, value, green_format if value == lowest_total else None)
+
+
+def _write_highlighted_workbook(matrix, quotation_name, totals, supplier_totals, best_df, winners, spill_to_disk=False,
+                                counts=None, award=None, anomalies=None):
+    """
+    Streams the comparison sheet to xlsxwriter in constant_memory mode, one row at a
+    time, straight from the QuoteMatrix arrays (no combined object frame).
+    Layout: row 1 quotation name, row 2 column headers, data rows, one blank row, summary row.
+    Comparisons longer than one Excel sheet are split over "Quotation", "Quotation (2)", ...
+    sheets of SHEET_MAX_ITEMS items each, followed by a 'Summary' sheet with the per-sheet
+    and overall supplier totals.
+    Converted comparisons get a 'Currency' sheet (see currency.py). With an
+    allocation.Award an 'Award' sheet follows (see _write_award_sheet), and with
+    a non-empty anomalies frame an 'Anomalies' sheet (see anomalies.detect_anomalies).
+    Returns a BytesIO, or a temporary file when spill_to_disk is set, positioned at 0.
+    counts (profiling) is filled with the sheets, columns, static formats, rules and bytes written.
+    """
+    layout = _comparison_layout(matrix, best_df.columns)
+    if len(layout) > EXCEL_MAX_COLUMNS:
+        raise ValueError(f"The comparison needs {len(layout)} columns, more than Excel's {EXCEL_MAX_COLUMNS}; "
+                         "select fewer suppliers")
+
+    import xlsxwriter
+
+    output = tempfile.TemporaryFile() if spill_to_disk else io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+
+    bold_format = workbook.add_format({'bold': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    green_format = workbook.add_format({'bg_color': '#C6EFCE', 'font_color': '#006100'})  # light green fill, dark green text
+    red_format   = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})   # Light red
+    orange_format = workbook.add_format({'bg_color': '#FFEB9C', 'font_color': '#9C6500'})  # Light orange
+    formats = (bold_format, header_format, green_format, red_format, orange_format)
+
+    sheet_ranges = _sheet_ranges(matrix.num_items, SHEET_MAX_ITEMS)
+    sheet_names = ["Quotation"] + [f"Quotation ({i})" for i in range(2, len(sheet_ranges) + 1)]
+    sheet_totals, static_formats, rules = [], 0, 0
+    for name, (start, stop) in zip(sheet_names, sheet_ranges):
+        sheet_total, sheet_formats, sheet_rules = _write_comparison_sheet(
+            workbook.add_worksheet(name), formats, matrix, quotation_name, totals, best_df, winners, layout,
+            start, stop)
+        sheet_totals.append(sheet_total)
+        static_formats += sheet_formats
+        rules += sheet_rules
+
+    if len(sheet_ranges) > 1:
+        _write_summary_sheet(workbook.add_worksheet("Summary"), formats, matrix, quotation_name, sheet_names,
+                             sheet_ranges, sheet_totals, supplier_totals)
+
+    if matrix.currency is not None:
+        _write_currency_sheet(workbook, matrix, quotation_name, bold_format, header_format)
+
+    if award is not None:
+        _write_award_sheet(workbook, award, quotation_name, bold_format, header_format)
+
+    if anomalies is not None and len(anomalies):
+        _write_anomalies_sheet(workbook, anomalies, quotation_name, bold_format, header_format)
+
+    workbook.close()
+    if counts is not None:
+        counts.update(sheets=len(sheet_ranges), columns=len(layout), static_formats=static_formats, rules=rules,
+                      bytes=output.tell())
+    output.seek(0)
+    return output
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """
+    Selection-dependent results of compare_suppliers, everything the output workbook
+    is written from. The arrays may be shared with cached matrices, treat them as read-only.
+    - matrix: QuoteMatrix of the selected suppliers
+    - totals / supplier_totals: matrix.totals() and matrix.supplier_totals()
+    - best_df / winners: see compute_best_prices
+    - anomalies: flagged prices, see anomalies.detect_anomalies
+    """
+    matrix: QuoteMatrix
+    totals: np.ndarray
+    supplier_totals: np.ndarray
+    best_df: pd.DataFrame
+    winners: np.ndarray
+    anomalies: pd.DataFrame = None
+
+    def summary(self):
+        """
+        One row per supplier: total quote, lines quoted and lines where it has the lowest
+        unit price. Converted comparisons add each supplier's currency and the total as quoted.
+        """
+        summary = pd.DataFrame({
+            'SUPPLIER': self.matrix.suppliers,
+            'TOTAL QUOTE': self.supplier_totals,
+            'ITEMS QUOTED': (~np.isnan(self.matrix.prices)).sum(axis=0),
+            'LOWEST PRICES': self.winners.sum(axis=0),
+        })
+        if self.matrix.currency is not None:
+            converted = conversion_summary(self.matrix)
+            summary.insert(1, 'CURRENCY', converted['CURRENCY'].to_numpy())
+            summary.insert(2, 'TOTAL QUOTE (QUOTED)', converted['TOTAL QUOTE (QUOTED)'].to_numpy())
+        return summary
+
+
+def compare_suppliers(uploaded_file, supplier_names, supplier_currencies=None, base_currency=None, fx_rates=None):
+    """
+    Selection-dependent stage of the comparison: selects the suppliers and finds the
+    best prices. uploaded_file is the quotation frame (read with header=[1, 2]) or a
+    QuoteMatrix built from it. Totals already computed on a QuoteMatrix are sliced
+    for the selection instead of recomputed, so keeping the full matrix of an upload
+    around makes changing the selection cheap.
+    With base_currency, prices are first converted from supplier_currencies
+    ({supplier: currency}, see currency.convert_currency) using fx_rates (default: the local FX table).
+    """
+    with profiling.stage("build_matrix") as counts:
+        if not isinstance(uploaded_file, QuoteMatrix):
+            uploaded_file = QuoteMatrix.from_quotation_frame(uploaded_file)
+        matrix = uploaded_file.select(supplier_names)
+        counts.update(rows=matrix.num_items, suppliers=matrix.num_suppliers)
+
+    if base_currency:
+        with profiling.stage("currency", rows=matrix.num_items, suppliers=matrix.num_suppliers) as counts:
+            matrix = convert_currency(matrix, supplier_currencies, base_currency, fx_rates)
+            counts.update(converted=0 if matrix.currency is None else int(matrix.currency.converted.sum()))
+
+    with profiling.stage("compute", rows=matrix.num_items, suppliers=matrix.num_suppliers):
+        totals = matrix.totals()
 
-    header = pd.DataFrame([{col: "" for col in uploaded_file.columns}])
-    header.iloc[0,0] = 'QUOTATION NAME:'
-    header.iloc[0,1] = quotation_name  
+        # Lowest unit price per row and which supplier(s) hold it
+        best_df, winners = compute_best_prices(matrix.prices, matrix.suppliers)
 
-    blank_row = pd.DataFrame([{col: "" for col in uploaded_file.columns}])
+        # Summary row: total quote per supplier
+        supplier_totals = matrix.supplier_totals()
 
+    with profiling.stage("anomalies", rows=matrix.num_items, suppliers=matrix.num_suppliers) as counts:
+        anomalies = detect_anomalies(matrix)
+        counts.update(flagged=len(anomalies))
 
-    # 2: Add summary row for each supplier
-    summary_row = {'ITEM CODE': 'TOTAL_QUOTE'}  
-    for col in uploaded_file.columns:
-        if col.endswith("_TOTAL"):
-            summary_row[col] = uploaded_file[col].sum()
+    return Comparison(matrix=matrix, totals=totals, supplier_totals=supplier_totals, best_df=best_df, winners=winners,
+                      anomalies=anomalies)
 
-    summary_row_df = pd.DataFrame([summary_row])
 
-    # 3: Concatenate everything
-    # print(f"columns in uploaded file {uploaded_file.columns}")
-    final_df = pd.concat([uploaded_file, blank_row, summary_row_df], ignore_index=True)
-    print("here")
-    print(uploaded_file)
+def write_comparison(comparison, quotation_name, spill_to_disk=False, award=None):
+    """Serialized stage: the highlighted workbook of a Comparison (see _write_highlighted_workbook)."""
+    with profiling.stage("write", rows=comparison.matrix.num_items, spill_to_disk=spill_to_disk) as counts:
+        return _write_highlighted_workbook(comparison.matrix, quotation_name, comparison.totals,
+                                           comparison.supplier_totals, comparison.best_df, comparison.winners,
+                                           spill_to_disk=spill_to_disk, counts=counts, award=award,
+                                           anomalies=comparison.anomalies)
+
+
+def modify_uploaded_file(uploaded_file, supplier_names, quotation_name, return_frame=True, spill_to_disk=False,
+                         progress=None, award_constraints=None, supplier_currencies=None, base_currency=None):
+    """
+    Args:
+    uploaded_file: DataFrame containing the uploaded Excel file (read with header=[1, 2]),
+        or a QuoteMatrix already built from it. It is not modified.
+    supplier_names: List of supplier names to be processed (#TODO: make this input flexy as needed)
+    quotation_name: Written to cell B1 of the output
+    return_frame: If False, the concatenated final_df (data, blank row, summary row) is not built
+        and None is returned in its place; the workbook is written from the arrays either way
+    spill_to_disk: Write the output workbook to a temporary file instead of an in-memory buffer
+    progress: Optional callable, called with "compute" and then "write" as each stage starts
+    award_constraints: Optional allocation.AwardConstraints; when given, the award plan
+        of the selected suppliers is solved and written to an 'Award' sheet
+    supplier_currencies / base_currency: Optional {supplier: currency} and the currency to
+        compare in; prices are converted with the local FX table (see currency.py)
+
+    Builds the comparison for the selected suppliers
+    - finds unit price columns
+    - adds total price columns for each supplier
+    - add summary row
+    - adds best price columns (BEST UP, BEST SUPPLIER, TIES, SAVING VS 2ND)
+    - Highlights lowest unit prices per row and lowest total in summary
+    """
 
-    # 4: Apply highlighting 
+    # 1. Unit prices, availability and totals of the selected suppliers as matrices,
+    # the lowest unit price per row and the total quote per supplier
+    if progress:
+        progress("compute")
+    comparison = compare_suppliers(uploaded_file, supplier_names, supplier_currencies, base_currency)
+    matrix = comparison.matrix
+    award = None
+    if award_constraints is not None:
+        with profiling.stage("award", rows=matrix.num_items, suppliers=matrix.num_suppliers) as counts:
+            award = solve_award(matrix, award_constraints)
+            counts.update(solver=award.solver)
+
+    # 2: Write the highlighted workbook
     # for each row, highlight lowest UP per supplier
     # lowest total per supplier
     # and highlight availability columns with specific colors
-    output_buffer = io.BytesIO()
-    with pd.ExcelWriter(output_buffer, engine='xlsxwriter') as writer:
-        workbook = writer.book
-        worksheet_name = "Quotation"
-
-        header.to_excel(writer, index=False, header=False, sheet_name=worksheet_name, startrow=0)
-        final_df.to_excel(writer, index=False, sheet_name=worksheet_name, startrow=1)
-
-        worksheet = writer.sheets['Quotation']
-
-        bold_format = workbook.add_format({'bold': True})
-
-        worksheet.write('A1', 'QUOTATION NAME:', bold_format)
-        worksheet.write('B1', quotation_name)
-
-        green_format = workbook.add_format({'bg_color': '#C6EFCE', 'font_color': '#006100'})  # light green fill, dark green text
-        red_format   = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})   # Light red
-        orange_format = workbook.add_format({'bg_color': '#FFEB9C', 'font_color': '#9C6500'})  # Light orange
-
-        # worksheet.write(0, 0, 'QUOTATION NAME:', bold_format)
-        # worksheet.write(0, 1, quotation_name)  
-
-    # Highlight lowest UP per row
-        up_cols = [f"{supplier}_UP" for supplier in input_suppliers_upper if f"{supplier}_UP" in final_df.columns]
-        for row in range(1, len(uploaded_file) + 2):  # Data rows only
-            col_letters = [xl_col_to_name(final_df.columns.get_loc(col)) for col in up_cols]
-            row_num = row + 1  # 1-based Excel row
-            if col_letters:
-                range_expr = ",".join(f"{letter}{row_num}" for letter in col_letters)
-                formula = f"MIN({range_expr})"
-                for letter in col_letters:
-                    cell = f"{letter}{row_num}"
-                    worksheet.conditional_format(cell, {
-                        'type': 'formula',
-                        'criteria': f"{cell}={formula}",
-                        'format': green_format
-                    })
-
-    # Highlight lowest total in summary row
-        total_cols = [f"{supplier}_TOTAL" for supplier in input_suppliers_upper if f"{supplier}_TOTAL" in final_df.columns]
-        summary_row_index = len(final_df) + 2  # 1-based
-        summary_letters = [xl_col_to_name(final_df.columns.get_loc(col)) for col in total_cols]
-        if summary_letters:
-            range_expr = ",".join(f"{letter}{summary_row_index}" for letter in summary_letters)
-            formula = f"MIN({range_expr})"
-            for letter in summary_letters:
-                cell = f"{letter}{summary_row_index}"
-                worksheet.conditional_format(cell, {
-                    'type': 'formula',
-                    'criteria': f"{cell}={formula}",
-                    'format': green_format
-                })
-
-        output_buffer.seek(0)
-
-    # Highlighting the availability columns
-        avail_cols = [f"{supplier}_AVAILABLE" for supplier in input_suppliers_upper if f"{supplier}_AVAILABLE" in final_df.columns]
-
-        for row in range(1, len(uploaded_file) + 1):  # Adjusted for Excel's 1-based indexing
-            row_num = row + 1  # Excel row (data starts at row 4 = index 3)
-            for col in avail_cols:
-                col_letter = xl_col_to_name(final_df.columns.get_loc(col))
-                cell = f"{col_letter}{row_num}"
-                # print(cell)
-
-                worksheet.conditional_format(cell, {
-                    'type': 'cell',
-                    'criteria': '==',
-                    'value': '"NO"',
-                    'format': red_format
-                })
-
-                worksheet.conditional_format(cell, {
-                    'type': 'cell',
-                    'criteria': '==',
-                    'value': '"NOT SURE"',
-                    'format': orange_format
-                })
-
-    return final_df, output_buffer 
\ No newline at end of file
+    if progress:
+        progress("write")
+    output_buffer = write_comparison(comparison, quotation_name, spill_to_disk=spill_to_disk, award=award)
+
+    # 3: Materialize the comparison frame (only for callers that use it)
+    final_df = None
+    if return_frame:
+        with profiling.stage("frame", rows=matrix.num_items):
+            data = matrix.to_frame(comparison.best_df)
+            blank_row = pd.DataFrame([{col: "" for col in data.columns}])
+            summary_row = {'ITEM CODE': 'TOTAL_QUOTE'}
+            summary_row.update({f"{supplier}_TOTAL": total
+                                for supplier, total in zip(matrix.suppliers, comparison.supplier_totals)})
+            final_df = pd.concat([data, blank_row, pd.DataFrame([summary_row])], ignore_index=True)
+
+    return final_df, output_buffer
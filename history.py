@@ -0,0 +1,200 @@
+"""
+Local price history of processed quotations (SQLite).
+
+Every processed quote is appended as one row per (ITEM CODE, supplier) with the unit
+price as quoted and, when known, the currency it was quoted in, keyed by quotation,
+supplier and normalized ITEM CODE, with indexes on those keys so history lookups stay
+in the milliseconds with tens of thousands of quotes.
+
+    record_quotation(matrix, "Q-123", file_hash=file_digest(file_bytes), supplier_currencies={"HERMES": "USD"})
+    price_history("IT0001", supplier="HERMES", since="2025-01-01")
+    best_prices(["IT0001", "IT0002"])
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from quote_matrix import normalize_item_codes
+
+# SQLite file the app, jobs and batch runs record into; set VENDOR_HISTORY_DB="" to disable
+HISTORY_DB = os.environ.get("VENDOR_HISTORY_DB", "price_history.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    file_hash TEXT UNIQUE,
+    recorded_at REAL NOT NULL,
+    items INTEGER NOT NULL,
+    suppliers INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    quotation_id INTEGER NOT NULL REFERENCES quotations(id) ON DELETE CASCADE,
+    item_code TEXT NOT NULL,
+    supplier TEXT NOT NULL,
+    unit_price REAL NOT NULL,
+    qty REAL,
+    availability TEXT,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_quotations_name ON quotations(name);
+CREATE INDEX IF NOT EXISTS idx_quotations_recorded_at ON quotations(recorded_at);
+CREATE INDEX IF NOT EXISTS idx_prices_item_supplier ON prices(item_code, supplier);
+CREATE INDEX IF NOT EXISTS idx_prices_item_price ON prices(item_code, unit_price);
+CREATE INDEX IF NOT EXISTS idx_prices_item_currency_price ON prices(item_code, currency, unit_price);
+CREATE INDEX IF NOT EXISTS idx_prices_supplier_item ON prices(supplier, item_code);
+CREATE INDEX IF NOT EXISTS idx_prices_quotation ON prices(quotation_id);
+"""
+
+_write_lock = threading.Lock()
+_initialized = set()  # db paths whose schema exists already
+
+
+def history_enabled(db_path=HISTORY_DB):
+    return bool(db_path)
+
+
+@contextmanager
+def connect(db_path=HISTORY_DB):
+    """
+    Opens the store, creating the tables and indexes on first use. Commits when the
+    block succeeds, rolls back when it raises, and always closes the connection.
+    """
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        connection.execute("PRAGMA foreign_keys=ON")
+        if db_path not in _initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(prices)")}
+            if "currency" not in columns:  # stores created before currencies were recorded
+                connection.execute("ALTER TABLE prices ADD COLUMN currency TEXT")
+            _initialized.add(db_path)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _timestamp(value):
+    """Accepts epoch seconds, datetimes or date strings."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return pd.Timestamp(value).timestamp()
+
+
+def record_quotation(matrix, quotation_name, file_hash=None, recorded_at=None, db_path=HISTORY_DB,
+                     supplier_currencies=None):
+    """
+    Appends the numeric unit prices of a QuoteMatrix as quoted: a converted matrix
+    (see currency.py) is recorded with its original prices and currencies, otherwise
+    supplier_currencies ({supplier: currency}) gives the currency of each supplier
+    (NULL when unknown). A quotation whose file_hash is already stored is skipped
+    before any row is built, only updating the currencies of the suppliers given.
+    Returns the quotation id, or None when skipped.
+    """
+    prices, currencies = matrix.prices, {str(name).strip().upper(): str(currency).strip().upper()
+                                         for name, currency in (supplier_currencies or {}).items() if currency}
+    if matrix.currency is not None:
+        prices = matrix.currency.original_prices
+        currencies.update(zip(matrix.suppliers, matrix.currency.currencies.tolist()))
+
+    with _write_lock, connect(db_path) as connection:
+        existing = file_hash is not None and connection.execute(
+            "SELECT id FROM quotations WHERE file_hash = ?", (file_hash,)).fetchone()
+        if existing:
+            connection.executemany(
+                "UPDATE prices SET currency = ? WHERE quotation_id = ? AND supplier = ? AND currency IS NOT ?",
+                ((currency, existing[0], supplier, currency) for supplier, currency in currencies.items()))
+            return None
+        item_codes = normalize_item_codes(matrix.item_columns.get('ITEM CODE', np.full(matrix.num_items, None)))
+        items, suppliers = np.nonzero(~np.isnan(prices) & (item_codes != None)[:, None])  # noqa: E711
+        availability = matrix.availability_labels()[items, suppliers]
+        qty = matrix.qty[items]
+        supplier_names = matrix.suppliers.to_numpy(dtype=object)
+        rows = zip(
+            item_codes[items].tolist(),
+            supplier_names[suppliers].tolist(),
+            prices[items, suppliers].tolist(),
+            np.where(np.isnan(qty), None, qty).tolist(),
+            availability.tolist(),
+            np.array([currencies.get(name) for name in supplier_names], dtype=object)[suppliers].tolist(),
+        )
+        cursor = connection.execute(
+            "INSERT INTO quotations (name, file_hash, recorded_at, items, suppliers) VALUES (?, ?, ?, ?, ?)",
+            (str(quotation_name), file_hash, _timestamp(recorded_at) if recorded_at is not None else time.time(),
+             matrix.num_items, matrix.num_suppliers))
+        quotation_id = cursor.lastrowid
+        connection.executemany(
+            "INSERT INTO prices (quotation_id, item_code, supplier, unit_price, qty, availability, currency) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((quotation_id, *row) for row in rows))
+    return quotation_id
+
+
+def _query(sql, params, db_path):
+    with connect(db_path) as connection:
+        frame = pd.read_sql_query(sql, connection, params=params)
+    if "recorded_at" in frame:
+        frame["recorded_at"] = pd.to_datetime(frame["recorded_at"], unit="s")
+    return frame
+
+
+def price_history(item_code, supplier=None, since=None, db_path=HISTORY_DB):
+    """Every recorded unit price of one ITEM CODE (optionally one supplier), oldest first."""
+    sql = ("SELECT q.recorded_at, q.name AS quotation, p.supplier, p.unit_price, p.currency, p.qty, p.availability "
+           "FROM prices p JOIN quotations q ON q.id = p.quotation_id WHERE p.item_code = ?")
+    params = [normalize_item_codes([item_code])[0]]
+    if supplier is not None:
+        sql += " AND p.supplier = ?"
+        params.append(str(supplier).strip().upper())
+    if since is not None:
+        sql += " AND q.recorded_at >= ?"
+        params.append(_timestamp(since))
+    return _query(sql + " ORDER BY q.recorded_at, p.supplier", params, db_path)
+
+
+def best_prices(item_codes=None, since=None, suppliers=None, db_path=HISTORY_DB):
+    """
+    Lowest unit price ever recorded per ITEM CODE and currency (all items when
+    item_codes is None, among all suppliers when suppliers is None), with the supplier
+    and quotation that offered it. Prices are only compared within one currency;
+    prices recorded without one form their own row.
+    """
+    codes_sql, code_params = "SELECT DISTINCT item_code, currency FROM prices WHERE 1", []
+    if item_codes is not None:
+        codes = [code for code in normalize_item_codes(list(item_codes)) if code is not None]
+        codes_sql += f" AND item_code IN ({', '.join('?' * len(codes)) or 'NULL'})"
+        code_params += codes
+
+    # one index seek on (item_code, currency, unit_price) per item and currency instead of a GROUP BY
+    cheapest_sql = ("SELECT p2.rowid FROM prices p2 JOIN quotations q2 ON q2.id = p2.quotation_id "
+                    "WHERE p2.item_code = c.item_code AND p2.currency IS c.currency")
+    cheapest_params = []
+    if since is not None:
+        cheapest_sql += " AND q2.recorded_at >= ?"
+        cheapest_params.append(_timestamp(since))
+    if suppliers is not None:
+        names = list(dict.fromkeys(str(name).strip().upper() for name in suppliers))
+        placeholders = ', '.join('?' * len(names)) or 'NULL'
+        cheapest_sql += f" AND p2.supplier IN ({placeholders})"
+        cheapest_params += names
+        codes_sql += f" AND supplier IN ({placeholders})"
+        code_params += names
+    cheapest_sql += " ORDER BY p2.unit_price LIMIT 1"
+
+    sql = ("SELECT p.item_code, p.supplier, p.unit_price AS best_unit_price, p.currency, q.name AS quotation, "
+           "q.recorded_at "
+           "FROM prices p JOIN quotations q ON q.id = p.quotation_id "
+           f"WHERE p.rowid IN (SELECT ({cheapest_sql}) FROM ({codes_sql}) c) ORDER BY p.item_code, p.currency")
+    return _query(sql, cheapest_params + code_params, db_path)  # placeholders in SQL text order
+
+
+def list_quotations(db_path=HISTORY_DB):
+    return _query("SELECT id, name, recorded_at, items, suppliers FROM quotations ORDER BY recorded_at DESC",
+                  [], db_path)
@@ -0,0 +1,234 @@
+"""
+Multi-file ingest: one quotation workbook per supplier, joined on ITEM CODE.
+
+Each supplier fills in their own copy of the template (one supplier column pair),
+so nobody has to copy prices into a single 'Supplier Quotation' sheet. The files
+are parsed on a thread pool, item codes are normalized (see normalize_item_codes) and
+all files are joined in one pass: pd.factorize over the concatenated codes hashes
+every code to a row of the combined matrix, and each file's prices are scattered
+into that row. The result is a QuoteMatrix, so the comparison, highlighting and
+history code run on it unchanged.
+
+    sources = load_supplier_files([("hermes.xlsx", hermes_bytes), ("acme.xlsx", acme_bytes)])
+    merged = merge_supplier_files(sources)
+    modify_uploaded_file(merged.matrix, merged.suppliers, merged.quotation_name)
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from quote_matrix import QuoteMatrix, normalize_item_codes
+from reader import QUOTATION_SHEET, quotation_frame, read_sheet_rows
+from validation import PLACEHOLDER_SUPPLIER
+
+# Below this many files they are parsed one after the other on the calling thread
+PARALLEL_MIN_FILES = 4
+
+
+@dataclass
+class SupplierFile:
+    """
+    One parsed supplier workbook.
+    - label: file name, used to name placeholder suppliers and in the coverage report
+    - item_codes: normalized ITEM CODE per row (None where blank)
+    """
+    label: str
+    quotation_name: object
+    matrix: QuoteMatrix
+    item_codes: np.ndarray
+
+
+@dataclass
+class MergedQuotation:
+    """
+    - matrix: every supplier of every file against the union of item codes, in the
+      order the codes first appear; item columns (DESCRIPTION, QTY, ...) come from
+      the first file that lists the item
+    - coverage: one row per item code missing from at least one file, with the number
+      of files quoting it and the suppliers whose files do not list it
+    - qty_conflicts: one row per item whose QTY differs between the files listing it,
+      with the QTY used (the first file's, which every supplier's TOTAL is computed
+      with) and the QTY in each file
+    - skipped: {file label: rows left out}, rows with a blank ITEM CODE or repeating a
+      code already listed earlier in the same file
+    """
+    matrix: QuoteMatrix
+    quotation_name: object
+    coverage: pd.DataFrame
+    qty_conflicts: pd.DataFrame = None
+    skipped: dict = field(default_factory=dict)
+
+    @property
+    def suppliers(self):
+        return list(self.matrix.suppliers)
+
+
+def load_supplier_file(label, file_bytes, engine="auto"):
+    sheets, _ = read_sheet_rows(file_bytes, [QUOTATION_SHEET], engine)
+    rows = sheets[QUOTATION_SHEET]
+    quotation_name = rows[0][1] if rows and len(rows[0]) > 1 else None
+    matrix = QuoteMatrix.from_quotation_frame(quotation_frame(rows))
+    if 'ITEM CODE' not in matrix.item_columns:
+        raise ValueError(f"{label}: the 'Supplier Quotation' sheet has no ITEM CODE column")
+    if not matrix.num_suppliers:
+        raise ValueError(f"{label}: no (Supplier, UP) columns found in the 'Supplier Quotation' header")
+
+    # a supplier that kept the template's "Supplier 1" header is named after its file
+    stem = Path(label).stem.strip().upper()
+    matrix.suppliers = pd.Index([stem if PLACEHOLDER_SUPPLIER.match(name) or not name else name
+                                 for name in matrix.suppliers])
+    return SupplierFile(label=label, quotation_name=quotation_name, matrix=matrix,
+                        item_codes=normalize_item_codes(matrix.item_columns['ITEM CODE']))
+
+
+def _load_supplier_file(args):
+    return load_supplier_file(*args)
+
+
+def load_supplier_files(files, engine="auto", workers=None):
+    """
+    Parses [(label, file bytes), ...] into SupplierFiles, in order. With several files
+    they are parsed on a thread pool of up to workers threads (default: the number of
+    cores), overlapping where the readers release the GIL (zip decompression).
+    Not worker processes: this runs on the app's job threads, where fork would copy a
+    multi-threaded Streamlit server, and spawn/forkserver workers re-run the main
+    script, which under `streamlit run` is app.py.
+    """
+    jobs = [(label, file_bytes, engine) for label, file_bytes in files]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1 or len(jobs) < PARALLEL_MIN_FILES:
+        return [_load_supplier_file(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+        return list(executor.map(_load_supplier_file, jobs))
+
+
+def merge_supplier_files(sources):
+    """
+    Joins SupplierFiles on their normalized item codes into a MergedQuotation.
+    Raises ValueError when the same supplier name comes from more than one file.
+    """
+    if not sources:
+        raise ValueError("No supplier files to merge")
+
+    owners = {}
+    for source in sources:
+        for name in source.matrix.suppliers:
+            owners.setdefault(name, []).append(source.label)
+    repeated = {name: labels for name, labels in owners.items() if len(labels) > 1}
+    if repeated:
+        raise ValueError("Supplier(s) found in more than one file: " + "; ".join(
+            f"{name} ({', '.join(labels)})" for name, labels in repeated.items()))
+
+    # hash join: one id per distinct code across all files, -1 for blanks
+    codes = np.concatenate([source.item_codes for source in sources])
+    ids, uniques = pd.factorize(codes)
+    file_of_row = np.repeat(np.arange(len(sources)), [len(source.item_codes) for source in sources])
+    num_items = len(uniques)
+    # a code repeated within one file keeps its first row
+    repeats = pd.Series(file_of_row.astype(np.int64) * (num_items + 1) + ids).duplicated().to_numpy()
+    keep = (ids >= 0) & ~repeats
+
+    # first row listing each code supplies its item columns
+    _, first = np.unique(ids[keep], return_index=True)
+    first = np.flatnonzero(keep)[first]
+    item_names = list(dict.fromkeys(name for source in sources for name in source.matrix.item_columns))
+    item_columns = {}
+    for name in item_names:
+        values = np.concatenate([source.matrix.item_columns.get(name, np.full(len(source.item_codes), None))
+                                 for source in sources])
+        item_columns[name] = values[first]
+    row_qty = np.concatenate([source.matrix.qty for source in sources])
+    qty = row_qty[first]
+
+    num_suppliers = sum(source.matrix.num_suppliers for source in sources)
+    prices = np.full((num_items, num_suppliers), np.nan)
+    availability = np.full((num_items, num_suppliers), -1, dtype=np.int8)
+    present = np.zeros((num_items, len(sources)), dtype=bool)
+    raw_prices, raw_availability, skipped = {}, {}, {}
+
+    offset, start = 0, 0
+    for f, source in enumerate(sources):
+        matrix, rows = source.matrix, len(source.item_codes)
+        kept = np.flatnonzero(keep[start:start + rows])
+        target = ids[start + kept]
+        columns = slice(offset, offset + matrix.num_suppliers)
+        prices[target, columns] = matrix.prices[kept]
+        availability[target, columns] = matrix.availability[kept]
+        present[target, f] = True
+
+        row_map = dict(zip(kept.tolist(), target.tolist()))
+        for raw, merged in ((matrix.raw_prices, raw_prices), (matrix.raw_availability, raw_availability)):
+            merged.update({(row_map[i], offset + j): value for (i, j), value in raw.items() if i in row_map})
+        if len(kept) < rows:
+            skipped[source.label] = rows - len(kept)
+        offset += matrix.num_suppliers
+        start += rows
+
+    matrix = QuoteMatrix(
+        item_columns=item_columns,
+        qty=qty,
+        suppliers=pd.Index([name for source in sources for name in source.matrix.suppliers]),
+        prices=prices,
+        availability=availability,
+        has_availability=np.concatenate([source.matrix.has_availability for source in sources]),
+        raw_prices=raw_prices,
+        raw_availability=raw_availability,
+    )
+    quotation_name = next((source.quotation_name for source in sources if source.quotation_name is not None), None)
+    return MergedQuotation(matrix=matrix, quotation_name=quotation_name,
+                           coverage=_coverage_report(sources, uniques, item_columns, present),
+                           qty_conflicts=_qty_conflicts(sources, uniques, item_columns, qty, row_qty,
+                                                        np.flatnonzero(keep), ids, file_of_row),
+                           skipped=skipped)
+
+
+def _file_suppliers(sources):
+    return np.array([", ".join(source.matrix.suppliers) for source in sources], dtype=object)
+
+
+def _coverage_report(sources, codes, item_columns, present):
+    partial = np.flatnonzero(~present.all(axis=1))
+    file_suppliers = _file_suppliers(sources)
+    return pd.DataFrame({
+        'ITEM CODE': codes[partial],
+        'DESCRIPTION': item_columns.get('DESCRIPTION', np.full(len(codes), None))[partial],
+        'FILES': present[partial].sum(axis=1),
+        'MISSING FROM': [", ".join(file_suppliers[~row]) for row in present[partial]],
+    })
+
+
+def _qty_conflicts(sources, codes, item_columns, qty, row_qty, rows, ids, file_of_row):
+    """
+    Items whose QTY in one of the files (rows: the kept rows of all files) differs from
+    the QTY used, including a blank QTY used; a file leaving QTY blank is not a conflict.
+    """
+    used = qty[ids[rows]]
+    differs = ~np.isnan(row_qty[rows]) & (np.isnan(used) | (row_qty[rows] != used))
+    items = np.unique(ids[rows[differs]])
+    file_suppliers = _file_suppliers(sources)
+    by_file = {item: [] for item in items.tolist()}
+    for row in rows[np.isin(ids[rows], items)].tolist():
+        value = 'blank' if np.isnan(row_qty[row]) else f"{row_qty[row]:g}"
+        by_file[int(ids[row])].append(f"{file_suppliers[file_of_row[row]]}: {value}")
+    return pd.DataFrame({
+        'ITEM CODE': codes[items],
+        'DESCRIPTION': item_columns.get('DESCRIPTION', np.full(len(codes), None))[items],
+        'QTY USED': qty[items],
+        'QTY BY FILE': ["; ".join(by_file[item]) for item in items.tolist()],
+    })
+
+
+def merge_uploaded_files(files, engine="auto", workers=None):
+    """load_supplier_files + merge_supplier_files for [(label, file bytes), ...]."""
+    with profiling.stage("parse", files=len(files), bytes=sum(len(file_bytes) for _, file_bytes in files)):
+        sources = load_supplier_files(files, engine=engine, workers=workers)
+    with profiling.stage("merge", files=len(sources)) as counts:
+        merged = merge_supplier_files(sources)
+        counts.update(rows=merged.matrix.num_items, partial=len(merged.coverage),
+                      qty_conflicts=len(merged.qty_conflicts))
+    return merged
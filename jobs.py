@@ -0,0 +1,217 @@
+"""
+Background execution of comparisons so a large upload doesn't block the Streamlit script.
+
+submit_merged_comparison (one workbook, or one workbook per supplier, see ingest.py)
+hands the work to a small thread pool and returns a ComparisonJob the app polls on
+each rerun. Jobs are keyed by the uploads' content hashes and the supplier selection,
+so resubmitting the same request (every rerun does) returns the running or finished
+job instead of starting another.
+
+A job runs the pipeline as cached stages:
+- prepare_upload: parsed upload -> QuoteMatrix of every supplier with per-supplier
+  totals, cached by content hash, so it is shared by every selection of that upload
+- compare_suppliers: selection-dependent best prices and summary (job.comparison),
+  slicing the prepared arrays (and converting them when a base currency is chosen)
+- write_comparison: the highlighted workbook (job.output), cached with the job
+Adding or removing a supplier name only reruns the last two.
+"""
+import contextlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+import history
+import profiling
+
+from currency import quoted_currencies
+from funcs import LRUCache, compare_suppliers, file_digest, parse_uploaded_file, write_comparison
+from ingest import merge_uploaded_files
+from quote_matrix import QuoteMatrix
+
+# Comparisons running at the same time across all sessions
+JOB_WORKERS = 2
+
+# Finished jobs kept for de-duplication (their results stay in memory until evicted)
+JOB_CACHE_MAX_ENTRIES = 16
+
+# Prepared uploads (full matrix and totals of every supplier) kept for new selections
+PREPARED_CACHE_MAX_ENTRIES = 4
+
+# Outputs with at least this many rows are written to a temporary file instead of memory
+SPILL_TO_DISK_ROWS = 100_000
+
+JOB_STAGES = ("queued", "parse", "compute", "write", "done")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="comparison")
+_jobs = LRUCache(JOB_CACHE_MAX_ENTRIES)
+_prepared = LRUCache(PREPARED_CACHE_MAX_ENTRIES)
+_submit_lock = threading.Lock()
+
+logger = logging.getLogger("vendor_comparison.jobs")
+
+
+@dataclass(frozen=True)
+class PreparedUpload:
+    """
+    Selection-independent stage of an upload: every supplier's prices with totals
+    and supplier totals already computed (memoized on the matrix, see QuoteMatrix).
+    coverage, qty_conflicts and skipped are set for merged uploads (see MergedQuotation).
+    """
+    matrix: QuoteMatrix
+    quotation_name: object
+    coverage: pd.DataFrame = None
+    qty_conflicts: pd.DataFrame = None
+    skipped: dict = None
+
+
+def prepare_upload(files):
+    """PreparedUpload of [(label, bytes), ...], cached by the files' content hash."""
+    key = _files_digest(files)
+    prepared = _prepared.get(key)
+    if prepared is not None:
+        return prepared
+
+    if len(files) > 1:
+        merged = merge_uploaded_files(files)
+        prepared = PreparedUpload(merged.matrix, merged.quotation_name, merged.coverage, merged.qty_conflicts,
+                                  merged.skipped)
+    else:
+        parsed = parse_uploaded_file(files[0][1])
+        with profiling.stage("matrix", rows=len(parsed.quotation)):
+            prepared = PreparedUpload(QuoteMatrix.from_quotation_frame(parsed.quotation), parsed.quotation_name)
+    with profiling.stage("totals", rows=prepared.matrix.num_items, suppliers=prepared.matrix.num_suppliers):
+        prepared.matrix.supplier_totals()
+    _prepared.put(key, prepared)
+    return prepared
+
+
+class ComparisonJob:
+    """
+    Handle of a submitted comparison.
+    stage is one of JOB_STAGES; once done() is true either error is set or
+    output holds the highlighted workbook bytes. When profiling is enabled, profile
+    holds the per-stage records of the run (see profiling.py). For merged uploads,
+    coverage holds the items missing from some of the files, qty_conflicts the items
+    whose QTY differs between them and skipped the rows left out per file (see MergedQuotation).
+    comparison (see funcs.Comparison) is set as soon as the best prices are known,
+    before the workbook is written.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.stage = "queued"
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.output = None
+        self.error = None
+        self.profile = []
+        self.coverage = None
+        self.qty_conflicts = None
+        self.skipped = None
+        self.quotation_name = None
+        self.comparison = None
+        self._future = None
+
+    @property
+    def progress(self):
+        """Fraction of the stages completed, for st.progress."""
+        return JOB_STAGES.index(self.stage) / (len(JOB_STAGES) - 1)
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.submitted_at
+
+    def done(self):
+        return self._future is not None and self._future.done()
+
+    def wait(self, timeout=None):
+        """Blocks until the job finishes; returns the output bytes or raises its error."""
+        self._future.result(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+    def _set_stage(self, stage):
+        self.stage = stage
+
+    def _run(self, files, supplier_names, supplier_currencies=None, base_currency=None):
+        recording = profiling.capture() if profiling.enabled() else contextlib.nullcontext(self.profile)
+        try:
+            with recording as self.profile:
+                self._set_stage("parse")
+                prepared = prepare_upload(files)
+                self.coverage, self.quotation_name = prepared.coverage, prepared.quotation_name
+                self.qty_conflicts, self.skipped = prepared.qty_conflicts, prepared.skipped
+                self._set_stage("compute")
+                self.comparison = compare_suppliers(prepared.matrix, supplier_names, supplier_currencies,
+                                                    base_currency)
+                self._set_stage("write")
+                matrix = self.comparison.matrix
+                output = write_comparison(self.comparison, prepared.quotation_name,
+                                          spill_to_disk=matrix.num_items >= SPILL_TO_DISK_ROWS)
+                with output:
+                    self.output = output.read()
+            self._set_stage("done")
+            self._record_history(prepared.matrix, prepared.quotation_name, files,
+                                 quoted_currencies(matrix, base_currency))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished_at = time.time()
+
+    def _record_history(self, matrix, quotation_name, files, supplier_currencies=None):
+        """
+        Appends the prices of every supplier in the upload (not only the selected ones),
+        as quoted, to the price history, once per upload; the comparison succeeded either way.
+        """
+        if not history.history_enabled():
+            return
+        try:
+            history.record_quotation(matrix, quotation_name, file_hash=_files_digest(files),
+                                     supplier_currencies=supplier_currencies)
+        except Exception:
+            logger.exception("Could not record quotation %r in the price history", quotation_name)
+
+
+def _files_digest(files):
+    if len(files) == 1:
+        return file_digest(files[0][1])
+    return file_digest(",".join(file_digest(file_bytes) for _, file_bytes in files).encode())
+
+
+def job_key(files, supplier_names, supplier_currencies=None, base_currency=None):
+    names = sorted({str(name).strip().upper() for name in supplier_names})
+    key = f"{_files_digest(files)}:{','.join(names)}"
+    if base_currency:
+        currencies = sorted(f"{str(name).strip().upper()}={str(currency).strip().upper()}"
+                            for name, currency in (supplier_currencies or {}).items() if currency)
+        key += f":{str(base_currency).strip().upper()}:{','.join(currencies)}"
+    return key
+
+
+def _submit(files, supplier_names, supplier_currencies=None, base_currency=None):
+    key = job_key(files, supplier_names, supplier_currencies, base_currency)
+    with _submit_lock:
+        job = _jobs.get(key)
+        if job is not None and job.error is None:
+            return job
+        job = ComparisonJob(key)
+        _jobs.put(key, job)
+        job._future = _executor.submit(job._run, files, list(supplier_names), dict(supplier_currencies or {}),
+                                       base_currency)
+    return job
+
+
+def submit_merged_comparison(files, supplier_names, supplier_currencies=None, base_currency=None):
+    """
+    Returns the job for these uploads, [(file name, bytes), ...], and supplier selection,
+    starting it if there is none yet; a job that failed is retried on the next submit.
+    Several files (one per supplier) are joined on ITEM CODE (see ingest.py), a single
+    file is compared as it is.
+    With base_currency, prices are converted from supplier_currencies first (see currency.py).
+    """
+    return _submit(list(files), supplier_names, supplier_currencies, base_currency)
@@ -0,0 +1,43 @@
+# Price history of previously processed quotations
+
+import streamlit as st
+from ui import login_screen
+from history import HISTORY_DB, best_prices, history_enabled, list_quotations, price_history
+
+if not st.user.is_logged_in:
+    login_screen()
+    st.stop()
+
+st.title("Price History")
+
+if not history_enabled():
+    st.info("Price history is turned off (VENDOR_HISTORY_DB is empty).")
+    st.stop()
+
+item_code = st.text_input("Item code")
+since = st.date_input("Since", value=None)
+
+if item_code:
+    prices = price_history(item_code, since=since)
+    if prices.empty:
+        st.warning(f"No prices recorded for item {item_code}.")
+    else:
+        suppliers = st.multiselect("Suppliers", sorted(prices["supplier"].unique()), placeholder="All suppliers")
+        if suppliers:
+            prices = prices[prices["supplier"].isin(suppliers)]
+
+        # prices are not converted: one best price per currency, and one line per supplier and currency
+        st.subheader("Best price")
+        best = best_prices([item_code], since=since, suppliers=suppliers or None)
+        best["currency"] = best["currency"].fillna("unknown")
+        st.dataframe(best[["item_code", "best_unit_price", "currency", "supplier", "quotation", "recorded_at"]],
+                     hide_index=True)
+
+        st.subheader("All quotes")
+        series = prices.assign(series=prices["supplier"] + " (" + prices["currency"].fillna("unknown") + ")")
+        st.line_chart(series.pivot_table(index="recorded_at", columns="series", values="unit_price"))
+        st.dataframe(prices, hide_index=True)
+
+with st.expander("Recorded quotations"):
+    st.dataframe(list_quotations(), hide_index=True)
+    st.caption(f"Stored in {HISTORY_DB}")
@@ -0,0 +1,95 @@
+"""
+Opt-in per-stage profiling of the comparison pipeline.
+
+Stages are wrapped in `with stage("name", rows=...) as counts:`. When profiling is
+off (the default) that costs a dict and a flag check. It is turned on by:
+
+- VENDOR_PROFILE=1: every stage is logged as JSON on the "vendor_comparison.profile" logger
+- VENDOR_PROFILE_FILE=path: records are also appended to a JSON-lines file
+- capture(): records of the stages run by the current thread are collected in a list
+
+Each record has the stage name, wall time, the tracemalloc peak above the memory in
+use when the stage started (skipped with VENDOR_PROFILE_MEMORY=0, tracemalloc slows
+allocation-heavy code down a lot) and the counts the stage reported. Stages must not
+be nested, and tracemalloc is process-wide, so memory of concurrent jobs overlaps.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_ENV = "VENDOR_PROFILE"
+PROFILE_FILE_ENV = "VENDOR_PROFILE_FILE"
+PROFILE_MEMORY_ENV = "VENDOR_PROFILE_MEMORY"
+
+logger = logging.getLogger("vendor_comparison.profile")
+
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+def enabled():
+    """True when stages are logged/written for every caller (env configuration)."""
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0") or bool(os.environ.get(PROFILE_FILE_ENV))
+
+
+def _collector():
+    return getattr(_local, "records", None)
+
+
+@contextmanager
+def capture():
+    """Collects the records of stages run by this thread inside the block."""
+    previous = _collector()
+    _local.records = records = []
+    try:
+        yield records
+    finally:
+        _local.records = previous
+
+
+@contextmanager
+def stage(name, **counts):
+    """
+    Times the block and records it with counts, which the block may update
+    (e.g. counts["rules"] = 2) once the numbers are known.
+    """
+    records = _collector()
+    if records is None and not enabled():
+        yield counts
+        return
+
+    trace_memory = os.environ.get(PROFILE_MEMORY_ENV, "1") != "0"
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()  # left running: stopping it would cut off concurrent stages
+        tracemalloc.reset_peak()
+        memory_at_start = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        record = {"stage": name, "seconds": round(time.perf_counter() - start, 6)}
+        if trace_memory:
+            record["peak_mb"] = round((tracemalloc.get_traced_memory()[1] - memory_at_start) / 1e6, 3)
+        record.update(counts)
+        record["timestamp"] = time.time()
+        _emit(record, records)
+
+
+def _emit(record, records):
+    if records is not None:
+        records.append(record)
+    if not enabled():
+        return
+
+    line = json.dumps(record, default=str)
+    logger.info(line)
+    path = os.environ.get(PROFILE_FILE_ENV)
+    if path:
+        with _file_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
@@ -0,0 +1,194 @@
+"""
+Columnar representation of a parsed supplier quotation.
+
+The 'Supplier Quotation' sheet is wide: three item columns followed by an
+(UP, AVAILABLE) pair per supplier. QuoteMatrix keeps the item columns as arrays
+and the supplier data as items x suppliers matrices, so totals, summaries and
+highlighting are array operations instead of per-supplier column inserts and
+name lookups. DataFrames and workbooks are only built from it at the edges.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+# Availability is stored as an int8 code: index into AVAILABILITY_LEVELS, -1 for blank/other
+AVAILABILITY_LEVELS = ('YES', 'NO', 'NOT SURE')
+AVAILABILITY_UNKNOWN = -1
+
+_AVAILABILITY_LABELS = np.array(AVAILABILITY_LEVELS + (None,), dtype=object)  # code -1 -> None
+_AVAILABILITY_CODES = {level: code for code, level in enumerate(AVAILABILITY_LEVELS)}
+
+
+def normalize_item_codes(values):
+    """
+    ITEM CODE values as comparable keys: stripped, upper-case strings, with numbers
+    typed as 1001 or read back as 1001.0 both becoming "1001". Blanks become None.
+    """
+    codes = pd.Series(values, dtype=object)
+    numeric = pd.to_numeric(codes, errors='coerce')
+    integral = numeric.notna() & (numeric % 1 == 0)
+    codes = codes.where(~integral, numeric[integral].astype('int64').astype(str))
+    text = codes.astype(str).str.strip().str.upper()
+    return text.where(codes.notna() & (text != "")).to_numpy(dtype=object, na_value=None)
+
+
+@dataclass
+class QuoteMatrix:
+    """
+    - item_columns: every non-supplier column of the sheet (ITEM CODE, DESCRIPTION, QTY, ...)
+      in sheet order, as object arrays of the values as typed
+    - qty: QTY as float64 (NaN where missing or not a number)
+    - suppliers: supplier names (upper case), one per matrix column
+    - prices: float64 items x suppliers unit prices, NaN where no numeric quote was given
+    - availability: int8 items x suppliers codes, see AVAILABILITY_LEVELS
+    - has_availability: whether each supplier has an AVAILABLE column in the sheet
+    - raw_prices / raw_availability: sparse {(item, supplier): value} of entries that are
+      not a number / not one of AVAILABILITY_LEVELS, kept so the output shows what was typed
+    - currency: set when prices were converted to one currency (currency.CurrencyConversion),
+      holding the prices as quoted
+    """
+    item_columns: dict
+    qty: np.ndarray
+    suppliers: pd.Index
+    prices: np.ndarray
+    availability: np.ndarray
+    has_availability: np.ndarray
+    raw_prices: dict = field(default_factory=dict)
+    raw_availability: dict = field(default_factory=dict)
+    currency: object = None
+    # per-supplier results memoized by totals()/supplier_totals() and carried over by select()
+    _totals: np.ndarray = field(default=None, repr=False, compare=False)
+    _supplier_totals: np.ndarray = field(default=None, repr=False, compare=False)
+
+    @property
+    def num_items(self):
+        return len(self.qty)
+
+    @property
+    def num_suppliers(self):
+        return len(self.suppliers)
+
+    @classmethod
+    def from_quotation_frame(cls, quotation):
+        """
+        Builds the matrix from the sheet read with the two-level header
+        (parse_uploaded_file(...).quotation). Columns whose second level is UP or
+        AVAILABLE belong to the supplier named in the first level; every other column
+        is an item column named by its first level.
+        """
+        item_columns, up_values, avail_values = {}, {}, {}
+        for position, col in enumerate(quotation.columns):
+            top, sub = col if isinstance(col, tuple) else (col, None)
+            kind = str(sub).strip().upper()
+            values = quotation.iloc[:, position]
+            if kind in ('UP', 'AVAILABLE'):
+                supplier = str(top).strip().upper()
+                (up_values if kind == 'UP' else avail_values).setdefault(supplier, values)
+            elif top not in item_columns:
+                item_columns[top] = values.to_numpy(dtype=object)
+
+        suppliers = pd.Index(list(dict.fromkeys(list(up_values) + list(avail_values))))
+        num_items = len(quotation)
+        prices = np.full((num_items, len(suppliers)), np.nan)
+        availability = np.full((num_items, len(suppliers)), AVAILABILITY_UNKNOWN, dtype=np.int8)
+        raw_prices, raw_availability = {}, {}
+
+        for j, supplier in enumerate(suppliers):
+            if supplier in up_values:
+                values = up_values[supplier]
+                numeric = pd.to_numeric(values, errors='coerce')
+                prices[:, j] = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+                for i in np.flatnonzero(numeric.isna().to_numpy() & values.notna().to_numpy()):
+                    raw_prices[(int(i), j)] = values.iat[i]
+            if supplier in avail_values:
+                values = avail_values[supplier]
+                # normalize the few distinct entries, not every cell; code -1 (blank) maps to the last slot
+                entries = pd.Categorical(values)
+                codes = [_AVAILABILITY_CODES.get(str(entry).strip().upper(), AVAILABILITY_UNKNOWN)
+                         for entry in entries.categories]
+                availability[:, j] = np.array(codes + [AVAILABILITY_UNKNOWN], dtype=np.int8)[entries.codes]
+                for i in np.flatnonzero((availability[:, j] == AVAILABILITY_UNKNOWN) & values.notna().to_numpy()):
+                    raw_availability[(int(i), j)] = values.iat[i]
+
+        qty = item_columns.get('QTY', np.full(num_items, np.nan))
+        return cls(
+            item_columns=item_columns,
+            qty=pd.to_numeric(pd.Series(qty), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan),
+            suppliers=suppliers,
+            prices=prices,
+            availability=availability,
+            has_availability=np.array([supplier in avail_values for supplier in suppliers], dtype=bool),
+            raw_prices=raw_prices,
+            raw_availability=raw_availability,
+        )
+
+    def select(self, supplier_names):
+        """
+        Returns a QuoteMatrix with only the given suppliers (matched case-insensitively),
+        in sheet order. Raises ValueError naming any supplier that is not in the sheet.
+        """
+        wanted = {str(name).strip().upper() for name in supplier_names}
+        missing = sorted(wanted.difference(self.suppliers))
+        if missing:
+            raise ValueError(f"Supplier(s) not found in the uploaded file: {', '.join(missing)}")
+
+        positions = np.flatnonzero(self.suppliers.isin(wanted))
+        remap = {int(old): new for new, old in enumerate(positions)}
+        return QuoteMatrix(
+            item_columns=self.item_columns,
+            qty=self.qty,
+            suppliers=self.suppliers[positions],
+            prices=self.prices[:, positions],
+            availability=self.availability[:, positions],
+            has_availability=self.has_availability[positions],
+            raw_prices={(i, remap[j]): v for (i, j), v in self.raw_prices.items() if j in remap},
+            raw_availability={(i, remap[j]): v for (i, j), v in self.raw_availability.items() if j in remap},
+            currency=None if self.currency is None else self.currency.select(positions),
+            _totals=None if self._totals is None else self._totals[:, positions],
+            _supplier_totals=None if self._supplier_totals is None else self._supplier_totals[positions],
+        )
+
+    def totals(self):
+        """items x suppliers total prices (UP * QTY), computed once per matrix. Treat as read-only."""
+        if self._totals is None:
+            self._totals = self.prices * self.qty[:, None]
+        return self._totals
+
+    def supplier_totals(self, totals=None):
+        """Sum of each supplier's totals, missing lines counted as 0 (memoized unless totals is given)."""
+        if totals is not None:
+            return np.nansum(totals, axis=0)
+        if self._supplier_totals is None:
+            self._supplier_totals = np.nansum(self.totals(), axis=0)
+        return self._supplier_totals
+
+    def availability_labels(self, rows=slice(None)):
+        """items x suppliers object array of YES/NO/NOT SURE (None for blank/other)."""
+        return _AVAILABILITY_LABELS[self.availability[rows]]
+
+    def to_frame(self, extra_columns=None):
+        """
+        The wide comparison table: item columns, then SUPPLIER_UP, SUPPLIER_TOTAL and
+        SUPPLIER_AVAILABLE per supplier, then extra_columns (e.g. the best price columns).
+        """
+        data = dict(self.item_columns)
+        prices = self.prices.astype(object)
+        for (i, j), value in self.raw_prices.items():
+            prices[i, j] = value
+        availability = self.availability_labels()
+        for (i, j), value in self.raw_availability.items():
+            availability[i, j] = value
+
+        totals = self.totals()
+        for j, supplier in enumerate(self.suppliers):
+            data[f"{supplier}_UP"] = prices[:, j] if self.raw_prices else self.prices[:, j]
+            data[f"{supplier}_TOTAL"] = totals[:, j]
+            if self.has_availability[j]:
+                data[f"{supplier}_AVAILABLE"] = availability[:, j]
+
+        frame = pd.DataFrame(data)
+        if extra_columns is not None:
+            for col in extra_columns.columns:
+                frame[col] = extra_columns[col].to_numpy()
+        return frame
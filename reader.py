@@ -0,0 +1,293 @@
+"""
+Readers for quotation workbooks.
+
+pd.read_excel with the default openpyxl engine builds the full cell model of the
+workbook (styles, merged ranges, the data validations added by
+generate_supplier_template) before pandas sees a single value. The engines here
+only pull cell values and build the quotation frames themselves:
+
+- "calamine": python-calamine (Rust) if installed, the fastest
+- "openpyxl-readonly": openpyxl streaming read_only mode, always available
+- "openpyxl": full openpyxl load, the slowest but most forgiving
+
+"auto" tries them in that order and falls back to the next engine when one is
+missing or fails on a file.
+
+read_header_rows is separate: it streams the first rows of a sheet straight from
+the workbook's XML, so checking the header of a large upload doesn't read the rest.
+"""
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import pandas as pd
+
+QUOTATION_SHEET = 'Supplier Quotation'
+
+READER_ENGINES = ("calamine", "openpyxl-readonly", "openpyxl")
+
+# Rows above the data of a 'Supplier Quotation' sheet: quotation name, supplier names, UP/AVAILABLE
+HEADER_ROWS = 3
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+
+
+def calamine_available():
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _resolve_sheet_names(available, sheet_names):
+    """Maps each requested sheet (name or 0-based index) to the real sheet name."""
+    resolved = {}
+    for name in sheet_names:
+        if isinstance(name, int):
+            resolved[name] = available[name]
+        elif name in available:
+            resolved[name] = name
+        else:
+            raise KeyError(f"Worksheet named '{name}' not found")
+    return resolved
+
+
+def _read_calamine(file_bytes, sheet_names):
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_filelike(io.BytesIO(file_bytes))
+    resolved = _resolve_sheet_names(workbook.sheet_names, sheet_names)
+    rows_by_name = {}
+    for name in set(resolved.values()):
+        # calamine returns "" for empty cells and floats for every number
+        rows_by_name[name] = [
+            [None if value == "" else int(value) if isinstance(value, float) and value.is_integer() else value
+             for value in row]
+            for row in workbook.get_sheet_by_name(name).to_python()
+        ]
+    return {key: rows_by_name[name] for key, name in resolved.items()}
+
+
+def _read_openpyxl(file_bytes, sheet_names, read_only):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=read_only, data_only=True)
+    try:
+        resolved = _resolve_sheet_names(workbook.sheetnames, sheet_names)
+        rows_by_name = {name: [list(row) for row in workbook[name].iter_rows(values_only=True)]
+                        for name in set(resolved.values())}
+        return {key: rows_by_name[name] for key, name in resolved.items()}
+    finally:
+        workbook.close()
+
+
+def read_sheet_rows(file_bytes, sheet_names, engine="auto"):
+    """
+    Returns ({sheet name or index: list of row value lists}, engine used).
+    Empty cells are None; trailing empty rows and columns are dropped.
+    """
+    if engine == "auto":
+        engines = [name for name in READER_ENGINES if name != "calamine" or calamine_available()]
+    elif engine in READER_ENGINES:
+        engines = [engine]
+    else:
+        raise ValueError(f"Unknown reader engine {engine!r}, expected 'auto' or one of {READER_ENGINES}")
+
+    errors = []
+    for name in engines:
+        try:
+            if name == "calamine":
+                sheets = _read_calamine(file_bytes, sheet_names)
+            else:
+                sheets = _read_openpyxl(file_bytes, sheet_names, read_only=(name == "openpyxl-readonly"))
+            trimmed = {}  # a sheet asked for by name and by index is only trimmed once
+            for rows in sheets.values():
+                if id(rows) not in trimmed:
+                    trimmed[id(rows)] = _trim(list(rows))
+            return {sheet: trimmed[id(rows)] for sheet, rows in sheets.items()}, name
+        except (KeyError, IndexError):
+            raise  # missing sheet: every engine would fail the same way
+        except Exception as e:
+            errors.append(f"{name}: {type(e).__name__}: {e}")
+    raise ValueError("Could not read the workbook (" + "; ".join(errors) + ")")
+
+
+def _sheet_part(archive, sheet_name):
+    """Path of a worksheet's XML part inside the xlsx archive."""
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relations = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {relation.get("Id"): relation.get("Target") for relation in relations}
+    for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+        if sheet.get("name") == sheet_name:
+            target = targets[sheet.get(_REL_ID)]
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise KeyError(f"Worksheet named '{sheet_name}' not found")
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def _text(element):
+    """Text of a shared or inline string, rich text runs joined, phonetic hints skipped."""
+    parts = [element.findtext(f"{_MAIN_NS}t") or ""]
+    parts += [run.findtext(f"{_MAIN_NS}t") or "" for run in element.iter(f"{_MAIN_NS}r")]
+    return "".join(parts)
+
+
+def _stream_header_rows(file_bytes, sheet_name, num_rows):
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as archive:
+        cells, shared = {}, set()  # (row, col) -> value; shared string indexes to resolve
+        with archive.open(_sheet_part(archive, sheet_name)) as part:
+            for _, element in ElementTree.iterparse(part):
+                if element.tag != f"{_MAIN_NS}row":
+                    continue
+                row = int(element.get("r")) - 1
+                if row >= num_rows:
+                    break
+                for position, cell in enumerate(element.iter(f"{_MAIN_NS}c")):
+                    ref = _CELL_REF.match(cell.get("r", ""))
+                    col = _column_index(ref.group(1)) if ref else position
+                    kind, value = cell.get("t", "n"), cell.findtext(f"{_MAIN_NS}v")
+                    if kind == "inlineStr":
+                        inline = cell.find(f"{_MAIN_NS}is")
+                        value = None if inline is None else _text(inline)
+                    elif value is None:
+                        continue
+                    elif kind == "s":
+                        value = int(value)
+                        shared.add(value)
+                    elif kind == "b":
+                        value = value == "1"
+                    elif kind == "n":
+                        number = float(value)
+                        value = int(number) if number.is_integer() else number
+                    cells[(row, col)] = (kind, value)
+                element.clear()
+
+        # the header's strings come first in the table; stop once they are all found
+        strings = {}
+        if shared:
+            with archive.open("xl/sharedStrings.xml") as part:
+                index = 0
+                for _, element in ElementTree.iterparse(part):
+                    if element.tag != f"{_MAIN_NS}si":
+                        continue
+                    if index in shared:
+                        strings[index] = _text(element)
+                        if len(strings) == len(shared):
+                            break
+                    index += 1
+                    element.clear()
+
+    rows = [[] for _ in range(num_rows)]
+    for (row, col), (kind, value) in cells.items():
+        rows[row] += [None] * (col + 1 - len(rows[row]))
+        rows[row][col] = strings[value] if kind == "s" else value
+    return rows
+
+
+def read_header_rows(file_bytes, sheet_name=QUOTATION_SHEET, num_rows=HEADER_ROWS):
+    """
+    The first num_rows rows of one sheet, in the shape read_sheet_rows returns (short
+    rows padded with None, trailing empty columns dropped, always num_rows rows).
+    Raises KeyError when the sheet does not exist and ValueError when the file is
+    not a workbook. Falls back to openpyxl's streaming mode for XML it can't follow.
+    """
+    try:
+        rows = _stream_header_rows(file_bytes, sheet_name, num_rows)
+    except KeyError as e:
+        if f"'{sheet_name}'" in str(e):
+            raise
+        rows = None  # unusual package layout
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not an Excel workbook (.xlsx): {e}") from e
+    except (ElementTree.ParseError, ValueError, IndexError, TypeError):
+        rows = None
+    if rows is None:
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+        try:
+            if sheet_name not in workbook.sheetnames:
+                raise KeyError(f"Worksheet named '{sheet_name}' not found")
+            rows = [list(row) for row in workbook[sheet_name].iter_rows(max_row=num_rows, values_only=True)]
+        finally:
+            workbook.close()
+    width = max((len(row) for row in rows), default=0)
+    rows = [list(row) + [None] * (width - len(row)) for row in rows] + [[None] * width] * (num_rows - len(rows))
+    while width and all(row[width - 1] is None for row in rows):
+        width -= 1
+    return [row[:width] for row in rows]
+
+
+def _trim(rows):
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    width = max((len(row) for row in rows), default=0)
+    while width and all(len(row) < width or row[width - 1] is None for row in rows):
+        width -= 1
+    return [list(row[:width]) + [None] * (width - len(row)) for row in rows]
+
+
+def _column_names(values):
+    """Single header row named the way pd.read_excel names it ("Unnamed: i", "X.1" for repeats)."""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def preview_frame(rows):
+    """The sheet read with its first row as header, like pd.read_excel(file)."""
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows[1:], columns=_column_names(rows[0]))
+
+
+def quotation_frame(rows):
+    """
+    The 'Supplier Quotation' sheet with the two-level (Supplier, UP/AVAILABLE) header
+    rebuilt from rows 2-3, like pd.read_excel(file, sheet_name='Supplier Quotation', header=[1, 2]).
+    Merged supplier names only fill their first cell, so they are carried forward.
+    """
+    if len(rows) < 3:
+        raise ValueError(f"The '{QUOTATION_SHEET}' sheet needs two header rows below the quotation name")
+
+    top, sub = rows[1], rows[2]
+    columns, supplier = [], None
+    for i, (name, kind) in enumerate(zip(top, sub)):
+        if kind is None:
+            columns.append((f"Unnamed: {i}_level_0" if name is None else name, f"Unnamed: {i}_level_1"))
+            supplier = None
+            continue
+        if name is not None:
+            supplier = name
+        columns.append((f"Unnamed: {i}_level_0" if supplier is None else supplier, kind))
+
+    return pd.DataFrame(rows[3:], columns=pd.MultiIndex.from_tuples(columns))
+
+
+def read_quotation(file_bytes, engine="auto"):
+    """
+    Reads an uploaded quotation workbook once with the chosen engine.
+    Returns (preview frame, quotation frame, quotation name, engine used), see
+    preview_frame/quotation_frame for the shape of the frames.
+    """
+    sheets, used = read_sheet_rows(file_bytes, [0, QUOTATION_SHEET], engine)
+    preview = preview_frame(sheets[0])
+    quotation_name = preview.columns[1] if len(preview.columns) > 1 else None
+    return preview, quotation_frame(sheets[QUOTATION_SHEET]), quotation_name, used
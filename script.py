@@ -1,11 +1,7 @@
 # Automating vendor comparison
 
-import pandas as pd
-import xlsxwriter
-import io
 import streamlit as st
-from xlsxwriter.utility import xl_col_to_name
-from funcs import generate_supplier_template, modify_uploaded_file
+from funcs import get_supplier_template, modify_uploaded_file, parse_uploaded_file
 
 st.title("Vendor Supplier Comparison")
 
@@ -17,11 +13,9 @@ num_suppliers = st.selectbox(
     options=options,
 )
 
-output = io.BytesIO()
-
 # Provide a template for supplier comparison
 
-buffer = generate_supplier_template(num_suppliers=num_suppliers, num_rows=100)
+buffer = get_supplier_template(num_suppliers=num_suppliers, num_rows=100)
 
 st.markdown("<h5><strong>1. Download the template below to add the quotations from different suppliers.</strong></h4>", 
             unsafe_allow_html=True)
@@ -60,7 +54,7 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file is not None:
     try:
-        df = pd.read_excel(uploaded_file)
+        df = parse_uploaded_file(uploaded_file.getvalue()).preview
         st.success("✅ File uploaded successfully!")
         st.write("Preview of uploaded data:")
         st.dataframe(df)
@@ -135,7 +129,7 @@ supplier_names_input = st.session_state.names
 
 if uploaded_file is not None and st.session_state.names:
     try:
-        file = pd.read_excel(uploaded_file, sheet_name='Supplier Quotation', header=[1, 2])
+        file = parse_uploaded_file(uploaded_file.getvalue()).quotation
         modified_df, excel_buffer = modify_uploaded_file(supplier_names=supplier_names_input, uploaded_file=file)
 
         st.download_button(
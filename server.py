@@ -0,0 +1,338 @@
+"""
+Headless HTTP service for programmatic comparisons (ERP integrations, scripts).
+
+Standard library only on top of the processing modules, no Streamlit and no login.
+Work runs on a bounded process pool: at most --workers requests are processed at
+once and --queue more wait for a worker; anything beyond that is answered right
+away with 503 and a Retry-After header instead of piling up. Results are cached by
+the upload's content hash and the request parameters, and identical requests that
+arrive while one is running wait for it instead of running again.
+
+    GET  /health
+    GET  /template?suppliers=3&rows=500
+    POST /compare?suppliers=HERMES,SARA&format=xlsx      (body: the filled-in .xlsx)
+    POST /compare?format=parquet&base_currency=EUR&currency=HERMES=USD
+
+/compare takes the workbook as the raw request body. The header is checked before
+the request is queued (see validation.py): a bad file gets 422 with the cells to fix.
+Without suppliers every supplier in the header is compared. format is xlsx (the
+highlighted workbook) or one of exports.EXPORT_FORMATS. Responses carry X-Cache
+(hit, miss or joined) and X-Processing-Seconds.
+
+    python server.py --port 8080 --workers 4 --queue 8
+    curl --data-binary @quote.xlsx "http://localhost:8080/compare?format=csv"
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from currency import check_currencies
+from exports import EXPORT_FORMATS, EXPORT_MIME_TYPES
+from funcs import TEMPLATE_MAX_ROWS, TEMPLATE_MAX_SUPPLIERS, LRUCache, file_digest
+from validation import validate_header
+
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Requests waiting for a worker on top of the ones being processed
+SERVICE_QUEUE_SIZE = 8
+
+# Finished results kept for repeated requests (whole output files, in memory)
+SERVICE_CACHE_MAX_ENTRIES = 32
+
+# Largest accepted upload
+SERVICE_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+# How long a request waits for its result before getting 504 (the work itself is not cancelled)
+SERVICE_TIMEOUT_SECONDS = 300
+
+# Retry-After sent with 503 when every worker and queue slot is taken
+RETRY_AFTER_SECONDS = 5
+
+# Start method of the worker processes. The pool starts them from the handler threads,
+# and forking a multi-threaded process copies whatever locks the other threads hold.
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+logger = logging.getLogger("vendor_comparison.server")
+
+
+class ServiceBusy(Exception):
+    """Every worker and queue slot is taken."""
+
+
+def _template(num_suppliers, num_rows):
+    from funcs import get_supplier_template
+    return get_supplier_template(num_suppliers=num_suppliers, num_rows=num_rows)
+
+
+def _compare(file_bytes, supplier_names, fmt, supplier_currencies, base_currency):
+    """Worker: the highlighted workbook (fmt "xlsx") or a columnar export of one upload, as bytes."""
+    from funcs import compare_suppliers, modify_uploaded_file, parse_uploaded_file
+
+    parsed = parse_uploaded_file(file_bytes, cache=False)  # the service caches results, not parsed frames
+    if fmt == "xlsx":
+        _, output = modify_uploaded_file(parsed.quotation, supplier_names, parsed.quotation_name, return_frame=False,
+                                         supplier_currencies=supplier_currencies, base_currency=base_currency)
+        return output.getvalue()
+
+    from exports import write_export
+    comparison = compare_suppliers(parsed.quotation, supplier_names, supplier_currencies, base_currency)
+    return write_export(comparison, fmt, parsed.quotation_name)
+
+
+class ProcessingService:
+    """
+    Bounded process pool with a result cache. run() returns (result, "hit" | "miss" |
+    "joined") or raises ServiceBusy when workers + queue_size requests are already
+    admitted. A slot is held until the work finishes, even if the caller gave up waiting.
+    When a worker process dies (out of memory, say) the pool is replaced on the next
+    request; the requests it was running fail.
+    """
+
+    def __init__(self, workers=None, queue_size=SERVICE_QUEUE_SIZE, cache_entries=SERVICE_CACHE_MAX_ENTRIES):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue_size
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._cache = LRUCache(cache_entries)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def run(self, key, fn, *args, timeout=SERVICE_TIMEOUT_SECONDS):
+        result = self._cache.get(key)
+        if result is not None:
+            return result, "hit"
+        with self._lock:
+            future, status = self._in_flight.get(key), "joined"
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    self.rejected += 1
+                    raise ServiceBusy()
+                try:
+                    future, status = self._submit(fn, *args), "miss"
+                except BaseException:
+                    self._slots.release()
+                    raise
+                self._in_flight[key] = future
+        if status == "miss":
+            # outside the lock: a future that is already done runs _finish right here
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future.result(timeout), status
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+
+    def _submit(self, fn, *args):
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            logger.warning("A worker process died; replacing the process pool")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            return self._executor.submit(fn, *args)
+
+    def _finish(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            self._cache.put(key, future.result())
+        with self._lock:
+            self._in_flight.pop(key, None)
+        self._slots.release()
+
+    def health(self):
+        return {"status": "ok", "workers": self.workers, "capacity": self.capacity, "in_flight": self.in_flight,
+                "rejected": self.rejected}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class RequestError(Exception):
+    def __init__(self, status, message, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = dict(error=message, **details)
+
+
+def _int_param(params, name, default, low, high):
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise RequestError(400, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise RequestError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _currency_params(params):
+    supplier_currencies = {}
+    for entry in params.get("currency", []):
+        supplier, _, currency = entry.partition("=")
+        if not supplier.strip() or not currency.strip():
+            raise RequestError(400, f"currency expects SUPPLIER=CODE, got {entry!r}")
+        supplier_currencies[supplier.strip().upper()] = currency.strip().upper()
+    base_currency = params.get("base_currency", [""])[0].strip().upper() or None
+    if supplier_currencies and not base_currency:
+        raise RequestError(400, "currency needs base_currency")
+    if base_currency:
+        try:
+            check_currencies(supplier_currencies, base_currency)
+        except ValueError as e:
+            raise RequestError(422, str(e))
+    return supplier_currencies, base_currency
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._dispatch({"/health": self._health, "/template": self._template})
+
+    def do_POST(self):
+        self._dispatch({"/compare": self._compare})
+
+    def _dispatch(self, routes):
+        url = urlparse(self.path)
+        route = routes.get(url.path.rstrip("/") or "/")
+        try:
+            if route is None:
+                raise RequestError(404, f"No route {self.command} {url.path}")
+            route(parse_qs(url.query))
+        except RequestError as e:
+            self._send_json(e.status, e.details)
+        except ServiceBusy:
+            self._send_json(503, {"error": "busy, retry later"}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except FutureTimeoutError:
+            self._send_json(504, {"error": f"no result within {SERVICE_TIMEOUT_SECONDS}s"})
+        except ValueError as e:
+            self._send_json(422, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s failed: %s: %s", url.path, type(e).__name__, e)
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _health(self, params):
+        self._send_json(200, self.service.health())
+
+    def _template(self, params):
+        num_suppliers = _int_param(params, "suppliers", 1, 1, TEMPLATE_MAX_SUPPLIERS)
+        num_rows = _int_param(params, "rows", 100, 1, TEMPLATE_MAX_ROWS)
+        self._run(f"template:{num_suppliers}x{num_rows}", XLSX_MIME_TYPE, "supplier_comparison_template.xlsx",
+                  _template, num_suppliers, num_rows)
+
+    def _compare(self, params):
+        file_bytes = self._read_body()
+        fmt = params.get("format", ["xlsx"])[0].lower()
+        if fmt != "xlsx" and fmt not in EXPORT_FORMATS:
+            raise RequestError(400, f"format must be xlsx or one of {', '.join(EXPORT_FORMATS)}")
+        names = [name.strip() for value in params.get("suppliers", []) for name in value.split(",") if name.strip()]
+        supplier_currencies, base_currency = _currency_params(params)
+
+        # rows 1-3 only: a bad file never takes a worker
+        check = validate_header(file_bytes, names or None)
+        if not check.ok:
+            raise RequestError(422, "invalid quotation header",
+                               issues=[{"cell": issue.cell, "message": issue.message} for issue in check.errors])
+        names = check.match_suppliers(names)[0] if names else list(check.suppliers)
+
+        key = ":".join([file_digest(file_bytes), fmt, ",".join(sorted(names)), base_currency or "",
+                        ",".join(f"{k}={v}" for k, v in sorted(supplier_currencies.items()))])
+        extension = ".xlsx" if fmt == "xlsx" else f".{fmt}"
+        self._run(f"compare:{key}", XLSX_MIME_TYPE if fmt == "xlsx" else EXPORT_MIME_TYPES[fmt],
+                  f"highlighted_quotation{extension}", _compare, file_bytes, names, fmt, supplier_currencies,
+                  base_currency)
+
+    def _read_body(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise RequestError(411, "Content-Length is required")
+        try:
+            length = int(length)
+        except ValueError:
+            raise RequestError(400, "Content-Length must be an integer")
+        if length < 0:
+            raise RequestError(400, "Content-Length must not be negative")
+        if length > SERVICE_MAX_UPLOAD_BYTES:
+            raise RequestError(413, f"uploads are limited to {SERVICE_MAX_UPLOAD_BYTES} bytes")
+        if not length:
+            raise RequestError(400, "the request body must be the .xlsx workbook")
+        return self.rfile.read(length)
+
+    def _run(self, key, content_type, file_name, fn, *args):
+        start = time.perf_counter()
+        result, cache_status = self.service.run(key, fn, *args)
+        self._send(200, result, content_type, {
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+            "X-Cache": cache_status,
+            "X-Processing-Seconds": f"{time.perf_counter() - start:.3f}",
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def log_error(self, format, *args):
+        logger.error("%s %s", self.address_string(), format % args)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status >= 400:
+            # the request body may not have been read, so the connection can't be reused
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(host="127.0.0.1", port=8080, service=None):
+    """ThreadingHTTPServer answering with ServiceHandler on a ProcessingService (a default one if None)."""
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service or ProcessingService()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--queue", type=int, default=SERVICE_QUEUE_SIZE,
+                        help="requests waiting for a worker before new ones get 503")
+    parser.add_argument("--cache", type=int, default=SERVICE_CACHE_MAX_ENTRIES, help="results kept in memory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    service = ProcessingService(args.workers, args.queue, args.cache)
+    server = make_server(args.host, args.port, service)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {service.workers} worker(s), "
+          f"queue {args.queue}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
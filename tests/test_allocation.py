@@ -0,0 +1,145 @@
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import allocation
+from allocation import AwardConstraints, solve_award
+from quote_matrix import AVAILABILITY_LEVELS, QuoteMatrix
+
+NO = AVAILABILITY_LEVELS.index('NO')
+
+needs_scipy = pytest.mark.skipif(not allocation.scipy_available(), reason="scipy is not installed")
+
+
+def make_matrix(prices, qty=None, availability=None):
+    prices = np.array(prices, dtype=np.float64)
+    num_items, num_suppliers = prices.shape
+    qty = np.ones(num_items) if qty is None else np.array(qty, dtype=np.float64)
+    return QuoteMatrix(
+        item_columns={'ITEM CODE': np.array([f"I{i}" for i in range(num_items)], dtype=object),
+                      'QTY': qty.astype(object)},
+        qty=qty,
+        suppliers=pd.Index([f"S{j}" for j in range(num_suppliers)]),
+        prices=prices,
+        availability=np.zeros(prices.shape, dtype=np.int8) if availability is None
+        else np.array(availability, dtype=np.int8),
+        has_availability=np.ones(num_suppliers, dtype=bool),
+    )
+
+
+def brute_force(matrix, constraints):
+    """(unawarded, cost) of the best plan over every assignment, lines may stay unawarded."""
+    costs = allocation._line_costs(matrix, allocation._feasible(matrix, constraints))
+    minimums = allocation._per_supplier(constraints.min_order_value, matrix.suppliers)
+    best = None
+    for plan in itertools.product(range(-1, matrix.num_suppliers), repeat=matrix.num_items):
+        plan = np.array(plan)
+        has_award = plan >= 0
+        line = costs[np.flatnonzero(has_award), plan[has_award]]
+        if not np.isfinite(line).all():
+            continue
+        values = np.bincount(plan[has_award], weights=line, minlength=matrix.num_suppliers)
+        used = values > 0
+        if constraints.max_suppliers is not None and used.sum() > constraints.max_suppliers:
+            continue
+        if (values[used] < minimums[used]).any():
+            continue
+        key = (int((~has_award).sum()), round(float(line.sum()), 6))
+        best = key if best is None or key < best else best
+    return best
+
+
+# 4 items x 3 suppliers: S0 is cheapest on items 0-1, S1 on items 2-3, S2 is a middling all-rounder
+PRICES = [
+    [10, 30, 19],
+    [10, 30, 19],
+    [30, 10, 19],
+    [30, 10, 19],
+]
+
+
+def test_unconstrained_awards_cheapest_per_line():
+    award = solve_award(make_matrix(PRICES))
+    assert award.solver == "cheapest per line"
+    assert award.awarded.tolist() == [0, 0, 1, 1]
+    assert award.total_cost == 40
+
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_single_supplier_limit(solver):
+    award = solve_award(make_matrix(PRICES), AwardConstraints(max_suppliers=1), solver)
+    assert award.awarded.tolist() == [2, 2, 2, 2]
+    assert award.total_cost == 76
+
+
+@needs_scipy
+def test_milp_meets_minimum_orders():
+    # S0 and S1 are worth 20 each on their cheap lines: with a minimum of 30, S2 taking everything is cheapest
+    award = solve_award(make_matrix(PRICES), AwardConstraints(min_order_value=30), "exact")
+    assert award.solver == "exact (milp)"
+    assert award.unawarded == 0
+    assert award.total_cost == 76
+    assert award.awarded.tolist() == [2, 2, 2, 2]
+
+
+def test_greedy_meets_minimum_orders():
+    award = solve_award(make_matrix(PRICES), AwardConstraints(min_order_value=30), "greedy")
+    assert award.unawarded == 0
+    assert award.total_cost == 76
+
+
+def test_branch_and_bound_meets_minimum_orders(monkeypatch):
+    monkeypatch.setattr(allocation, "scipy_available", lambda: False)
+    award = solve_award(make_matrix(PRICES), AwardConstraints(min_order_value=30), "exact")
+    assert award.solver == "heuristic (branch and bound)"
+    assert award.unawarded == 0
+    assert award.total_cost == 76
+
+
+def test_branch_and_bound_is_exact_for_supplier_limit(monkeypatch):
+    monkeypatch.setattr(allocation, "scipy_available", lambda: False)
+    prices = [[1, 9, 9, 5], [9, 1, 9, 5], [9, 9, 1, 5], [9, 9, 9, 5]]
+    award = solve_award(make_matrix(prices), AwardConstraints(max_suppliers=2), "exact")
+    assert award.solver == "exact (branch and bound)"
+    assert award.total_cost == brute_force(make_matrix(prices), AwardConstraints(max_suppliers=2))[1]
+
+
+def test_quotes_marked_no_are_not_awarded():
+    availability = [[NO, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    award = solve_award(make_matrix(PRICES, availability=availability))
+    assert award.awarded.tolist() == [2, 0, 1, 1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_solvers_against_brute_force(seed, monkeypatch):
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(1, 50, (6, 3)).round(2)
+    prices[rng.random(prices.shape) < 0.2] = np.nan
+    matrix = make_matrix(prices, qty=rng.integers(1, 4, 6))
+    constraints = AwardConstraints(max_suppliers=2, min_order_value=60)
+    optimum = brute_force(matrix, constraints)
+
+    def key(award):
+        return award.unawarded, round(award.total_cost, 6)
+
+    greedy = key(solve_award(matrix, constraints, "greedy"))
+    if allocation.scipy_available():
+        assert key(solve_award(matrix, constraints, "exact")) == pytest.approx(optimum)
+    monkeypatch.setattr(allocation, "scipy_available", lambda: False)
+    heuristic = key(solve_award(matrix, constraints, "exact"))
+    assert optimum <= heuristic <= greedy
+
+
+@needs_scipy
+def test_milp_time_limit_falls_back_to_greedy(monkeypatch):
+    monkeypatch.setattr(allocation, "_solve_milp", lambda *args: (None, False))
+    award = solve_award(make_matrix(PRICES), AwardConstraints(min_order_value=30), "exact")
+    assert award.solver == "greedy (milp hit its time limit)"
+    assert award.unawarded == 0
+    assert award.total_cost == 76
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history
+from quote_matrix import QuoteMatrix
+
+
+def make_matrix(prices, suppliers=("HERMES", "SARA")):
+    prices = np.array(prices, dtype=np.float64)
+    num_items, num_suppliers = prices.shape
+    return QuoteMatrix(
+        item_columns={'ITEM CODE': np.array([f"IT{i}" for i in range(num_items)], dtype=object)},
+        qty=np.ones(num_items),
+        suppliers=pd.Index(list(suppliers)),
+        prices=prices,
+        availability=np.zeros(prices.shape, dtype=np.int8),
+        has_availability=np.ones(num_suppliers, dtype=bool),
+    )
+
+
+def currencies(db_path):
+    with history.connect(db_path) as connection:
+        return dict(connection.execute("SELECT DISTINCT supplier, currency FROM prices"))
+
+
+def test_later_conversion_overwrites_stored_currency(tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    matrix = make_matrix([[10, 20], [30, 40]])
+    assert history.record_quotation(matrix, "Q-1", file_hash="abc", db_path=db_path,
+                                    supplier_currencies={"HERMES": "EUR", "SARA": "EUR"}) is not None
+    # the same file again, now with SARA set to USD: no new rows, SARA's currency is corrected
+    assert history.record_quotation(matrix, "Q-1", file_hash="abc", db_path=db_path,
+                                    supplier_currencies={"SARA": "USD"}) is None
+    assert currencies(db_path) == {"HERMES": "EUR", "SARA": "USD"}
+    # recording it without currencies leaves them as they are
+    history.record_quotation(matrix, "Q-1", file_hash="abc", db_path=db_path)
+    assert currencies(db_path) == {"HERMES": "EUR", "SARA": "USD"}
+
+
+def test_best_prices_are_per_currency(tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    history.record_quotation(make_matrix([[10, 20]]), "Q-1", file_hash="a", recorded_at=1, db_path=db_path,
+                             supplier_currencies={"HERMES": "EUR", "SARA": "USD"})
+    history.record_quotation(make_matrix([[15, 8]]), "Q-2", file_hash="b", recorded_at=2, db_path=db_path,
+                             supplier_currencies={"HERMES": "EUR", "SARA": "EUR"})
+    history.record_quotation(make_matrix([[5, 30]]), "Q-3", file_hash="c", recorded_at=3, db_path=db_path)
+
+    best = history.best_prices(["IT0"], db_path=db_path)
+    assert best.fillna({"currency": ""})[["currency", "supplier", "best_unit_price"]].values.tolist() == [
+        ["", "HERMES", 5.0], ["EUR", "SARA", 8.0], ["USD", "SARA", 20.0]]
+
+
+def test_best_prices_among_selected_suppliers(tmp_path):
+    db_path = str(tmp_path / "history.sqlite")
+    history.record_quotation(make_matrix([[10, 20, 5]], suppliers=("HERMES", "SARA", "ACME")), "Q-1",
+                             db_path=db_path)
+    best = history.best_prices(["IT0"], suppliers=["hermes", "SARA"], db_path=db_path)
+    assert best[["supplier", "best_unit_price"]].values.tolist() == [["HERMES", 10.0]]
+    assert history.best_prices(["IT0"], suppliers=[], db_path=db_path).empty
@@ -0,0 +1,28 @@
+import os
+import sys
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import ingest
+from synthetic import make_quotation_workbook
+
+
+def test_parallel_load_does_not_run_main_script(tmp_path, monkeypatch):
+    # under `streamlit run` the main module is app.py, which must not be re-run to parse files
+    script = tmp_path / "app.py"
+    script.write_text("raise AttributeError('the main script ran in a parse worker')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+
+    files = [(f"supplier{i}.xlsx", make_quotation_workbook(20, 1, seed=i)) for i in range(ingest.PARALLEL_MIN_FILES + 1)]
+    sources = ingest.load_supplier_files(files, workers=2)
+
+    assert [source.label for source in sources] == [label for label, _ in files]
+    for source, (label, file_bytes) in zip(sources, files):
+        expected = ingest.load_supplier_file(label, file_bytes)
+        np.testing.assert_array_equal(source.matrix.prices, expected.matrix.prices)
@@ -0,0 +1,15 @@
+"""
+Streamlit helpers shared by the app's pages. The processing modules (funcs, jobs,
+batch, server) don't import this, so workers and CLI runs never load Streamlit.
+"""
+import streamlit as st
+
+def login_screen():
+    st.header("This app is private.")
+    st.subheader("Please log in.")
+    st.button("Log in with Microsoft", on_click=st.login)
+
+def logout():
+    for key in st.session_state.keys():
+        del st.session_state[key]
+    st.rerun()
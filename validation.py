@@ -0,0 +1,172 @@
+"""
+Upfront checks of an uploaded quotation's header, before the workbook is parsed.
+
+Only rows 1-3 of the 'Supplier Quotation' sheet are read (see reader.read_header_rows),
+so a file with renamed headers or a supplier the user mistyped is rejected in
+milliseconds, with the cell to fix, instead of failing halfway through the comparison:
+
+- A1 is QUOTATION NAME: and B1 holds the name
+- A2:C2 are ITEM CODE, DESCRIPTION, QTY
+- from D on, every supplier is a name in row 2 over an UP column in row 3, usually
+  merged over UP and AVAILABLE like the template writes it
+
+Supplier names are compared the way QuoteMatrix.select compares them: stripped and
+upper-cased, so "Hermes " matches the HERMES header.
+
+    check = validate_header(file_bytes, ["hermes", "Sara"])
+    if not check.ok:
+        for issue in check.errors:
+            print(issue)  # "D2: supplier name is empty"
+"""
+import difflib
+import re
+from dataclasses import dataclass, field
+
+import profiling
+from reader import HEADER_ROWS, QUOTATION_SHEET, read_header_rows
+
+BASE_HEADERS = ('ITEM CODE', 'DESCRIPTION', 'QTY')
+
+QUOTATION_NAME_LABEL = 'QUOTATION NAME:'
+
+# Supplier headers left as generated by the template ("Supplier 1", ...)
+PLACEHOLDER_SUPPLIER = re.compile(r"^SUPPLIER \d+$")
+
+
+@dataclass(frozen=True)
+class HeaderIssue:
+    """A problem with one header cell ("D2"), or with the file as a whole (cell None)."""
+    cell: str
+    message: str
+
+    def __str__(self):
+        return f"{self.cell}: {self.message}" if self.cell else self.message
+
+
+@dataclass
+class HeaderCheck:
+    """
+    - quotation_name: value of B1
+    - suppliers: {upper-cased supplier name: cell of its name}, in sheet order
+    - errors: problems that would make the comparison fail or read the wrong columns
+    - warnings: problems the comparison survives (blank quotation name, a supplier
+      still named "Supplier 1", a supplier without an AVAILABLE column)
+    """
+    quotation_name: object = None
+    suppliers: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_for_errors(self):
+        if self.errors:
+            raise ValueError("Invalid quotation header: " + "; ".join(str(issue) for issue in self.errors))
+
+    def match_suppliers(self, supplier_names):
+        """
+        Maps entered names onto the header case-insensitively. Returns (matched header
+        names in the order entered, issues for the names not in the header).
+        """
+        matched, issues = [], []
+        for name in supplier_names:
+            key = str(name).strip().upper()
+            if key in self.suppliers:
+                if key not in matched:
+                    matched.append(key)
+                continue
+            message = f"supplier {str(name).strip()!r} is not in the header (row 2)"
+            close = difflib.get_close_matches(key, list(self.suppliers), n=1)
+            if close:
+                message += f", did you mean {close[0]!r} ({self.suppliers[close[0]]})?"
+            issues.append(HeaderIssue(None, message))
+        return matched, issues
+
+
+def _cell_name(row, col):
+    """A1-style name of a 0-based (row, col) cell; saves importing xlsxwriter to check a header."""
+    letters = ""
+    col += 1
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return f"{letters}{row + 1}"
+
+
+def _label(value):
+    return "" if value is None else str(value).strip().upper()
+
+
+def check_header_rows(rows):
+    """HeaderCheck of the first HEADER_ROWS rows of a 'Supplier Quotation' sheet."""
+    check = HeaderCheck()
+    rows = [list(row) + [None] * (len(BASE_HEADERS) + 1 - len(row)) for row in rows]
+    names, kinds = rows[1], rows[2]
+
+    if _label(rows[0][0]).rstrip(':') != QUOTATION_NAME_LABEL.rstrip(':'):
+        check.errors.append(HeaderIssue("A1", f"expected {QUOTATION_NAME_LABEL!r}, found {rows[0][0]!r}"))
+    check.quotation_name = rows[0][1]
+    if check.quotation_name is None or not str(check.quotation_name).strip():
+        check.warnings.append(HeaderIssue("B1", "quotation name is empty"))
+
+    for col, header in enumerate(BASE_HEADERS):
+        if _label(names[col]) != header:
+            check.errors.append(HeaderIssue(_cell_name(1, col), f"expected {header!r}, found {names[col]!r}"))
+        if kinds[col] is not None:
+            check.errors.append(HeaderIssue(_cell_name(2, col),
+                                            f"must be empty below {header!r}, found {kinds[col]!r}"))
+
+    col = len(BASE_HEADERS)
+    while col < len(kinds):
+        name_cell, kind = _cell_name(1, col), _label(kinds[col])
+        if kind != 'UP':
+            if kinds[col] is not None or names[col] is not None:
+                check.errors.append(HeaderIssue(_cell_name(2, col), f"expected 'UP', found {kinds[col]!r}"))
+            # a renamed UP column still pairs with the AVAILABLE next to it
+            col += 2 if col + 1 < len(kinds) and _label(kinds[col + 1]) == 'AVAILABLE' else 1
+            continue
+
+        width = 2 if col + 1 < len(kinds) and _label(kinds[col + 1]) == 'AVAILABLE' else 1
+        name = _label(names[col])
+        if not name:
+            check.errors.append(HeaderIssue(name_cell, "supplier name is empty"))
+        elif name in check.suppliers:
+            check.errors.append(HeaderIssue(name_cell, f"supplier {name!r} already used in {check.suppliers[name]}"))
+        else:
+            check.suppliers[name] = name_cell
+            if PLACEHOLDER_SUPPLIER.match(name):
+                check.warnings.append(HeaderIssue(name_cell, f"{names[col]!r} should be the supplier's name"))
+        if width == 1:
+            check.warnings.append(HeaderIssue(_cell_name(2, col + 1),
+                                              f"no AVAILABLE column after {name or 'the'} UP column"))
+        elif names[col + 1] is not None:
+            # a second name over AVAILABLE means the supplier cells are not merged as in the template
+            check.errors.append(HeaderIssue(_cell_name(1, col + 1),
+                                            f"must be empty (merged with {name_cell}), found {names[col + 1]!r}"))
+        col += width
+
+    if not any(value is not None for value in names[len(BASE_HEADERS):] + kinds[len(BASE_HEADERS):]):
+        check.errors.append(HeaderIssue("D3", "no supplier columns (a supplier name in row 2 over 'UP' in row 3)"))
+    return check
+
+
+def validate_header(file_bytes, supplier_names=None):
+    """
+    Checks the header of an uploaded workbook without parsing its data rows. With
+    supplier_names, names that are not in the header are reported as errors too.
+    Never raises for a bad file: problems are returned in HeaderCheck.errors.
+    """
+    with profiling.stage("validate", bytes=len(file_bytes)) as counts:
+        try:
+            rows = read_header_rows(file_bytes, QUOTATION_SHEET, HEADER_ROWS)
+        except KeyError:
+            return HeaderCheck(errors=[HeaderIssue(None, f"the workbook has no '{QUOTATION_SHEET}' sheet")])
+        except ValueError as e:
+            return HeaderCheck(errors=[HeaderIssue(None, str(e))])
+        check = check_header_rows(rows)
+        if supplier_names is not None:
+            check.errors.extend(check.match_suppliers(supplier_names)[1])
+        counts.update(suppliers=len(check.suppliers), errors=len(check.errors))
+    return check